@@ -0,0 +1,62 @@
+"""Serve the app on gevent: one greenlet per connection instead of one thread.
+
+Same routes and booking rules as ``flask run``, but thousands of clients can
+wait on their connection at once for the cost of a greenlet each. Disk and
+database calls that would stall every greenlet (journal fsyncs, SQLite)
+run on gevent's native thread pool, as do the snapshot writes of a
+journal compaction.
+
+    python async_server.py --port 5000
+"""
+from gevent import monkey
+
+# before anything imports socket, threading or time
+monkey.patch_all()
+
+import argparse
+import os
+
+from gevent import get_hub
+from gevent.pywsgi import WSGIServer
+
+import server
+from storage import SqliteStorage
+
+
+def in_threadpool(function):
+    def run(*args, **kwargs):
+        return get_hub().threadpool.apply(function, args, kwargs)
+    return run
+
+
+class ThreadpoolStorage:
+    """Storage wrapper running every operation on gevent's native thread pool."""
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    def __getattr__(self, name):
+        operation = getattr(self.storage, name)
+        return in_threadpool(operation) if callable(operation) else operation
+
+
+def make_persistence_non_blocking():
+    if server.JOURNAL is not None:
+        server.JOURNAL.fsync = in_threadpool(os.fsync)
+        # a compaction dumps every club to JSON: off the hub too
+        server.JOURNAL.offload = lambda function, *args: in_threadpool(function)(*args)
+    if isinstance(server.STORAGE.storage, SqliteStorage):
+        server.STORAGE.storage = ThreadpoolStorage(server.STORAGE.storage)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    args = parser.parse_args()
+    make_persistence_non_blocking()
+    WSGIServer((args.host, args.port), server.app).serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+import threading
+from contextlib import ExitStack
+from datetime import datetime
+
+from ledger import BookingLedger
+from models import DATE_FORMAT
+
+# places a club may hold in one competition, all its bookings together
+MAX_PLACES_PER_BOOKING = 12
+
+BOOKED = 'booked'
+INVALID_PLACES = 'invalid_places'
+PAST_COMPETITION = 'past_competition'
+NOT_ENOUGH_POINTS = 'not_enough_points'
+TOO_MANY_PLACES = 'too_many_places'
+NOT_ENOUGH_PLACES = 'not_enough_places'
+# the storage has no room left to count another club's places in a competition
+LEDGER_FULL = 'ledger_full'
+
+
+class BookingEngine:
+    """Checks and applies bookings atomically.
+
+    Each competition and each club has its own lock, so bookings on unrelated
+    competitions run in parallel while two bookings racing for the same
+    places are serialized. Locks are always taken competition first, then
+    club, which rules out deadlocks between bookings.
+
+    ``taken`` adds up the points and places each booking took, keyed by
+    ``(kind, name)``, so a reload of the JSON files can apply them again.
+    Every booking is also recorded in the ``ledger``, which tells how many
+    places a club already holds in a competition.
+    """
+
+    def __init__(self, journal=None, ledger=None):
+        self.journal = journal
+        self.ledger = BookingLedger() if ledger is None else ledger
+        # each key is only updated under its record's lock
+        self.taken = {}
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def lock_for(self, kind, name):
+        key = (kind, name)
+        lock = self._locks.get(key)
+        if lock is None:
+            with self._locks_guard:
+                lock = self._locks.setdefault(key, threading.Lock())
+        return lock
+
+    def book(self, club, competition, places_required, now=None):
+        """Book places for the club and return the outcome.
+
+        The outcome is ``BOOKED`` or the reason the booking was refused;
+        nothing is changed unless every rule passes. With a journal, the
+        booking is durable when this returns.
+        """
+        now = now or datetime.now()
+        seq = None
+        with self.lock_for('competition', competition.name), self.lock_for('club', club.name):
+            booked = self.ledger.booked(club.name, competition.name)
+            outcome = check(club, competition, places_required, now, booked=booked)
+            if outcome == BOOKED:
+                def apply():
+                    competition.number_of_places -= places_required
+                    club.points -= places_required
+                    self._record_taken('competition', competition.name, places_required)
+                    self._record_taken('club', club.name, places_required)
+                    self.ledger.record(club.name, competition.name, places_required, now)
+                if self.journal is None:
+                    apply()
+                else:
+                    entry = {'club': club.name, 'competition': competition.name, 'places': places_required,
+                             'at': now.strftime(DATE_FORMAT)}
+                    seq = self.journal.append(entry, apply=apply)
+        # wait for the fsync outside the locks so the next booking can proceed
+        if seq is not None:
+            self.journal.wait(seq)
+        return outcome
+
+    def book_many(self, club, items, now=None):
+        """Book several ``(competition, places)`` items for the club at once.
+
+        Returns ``(BOOKED, None)`` once every item is booked, or the reason and
+        the competition of the first item refused, in which case nothing is
+        booked at all.
+        """
+        now = now or datetime.now()
+        requested = merge_items(items)
+        seq = None
+        with ExitStack() as locks:
+            # competitions in name order then the club, the same order as book()
+            for name in sorted(competition.name for competition, _ in requested):
+                locks.enter_context(self.lock_for('competition', name))
+            locks.enter_context(self.lock_for('club', club.name))
+            booked = {competition.name: self.ledger.booked(club.name, competition.name) for competition, _ in requested}
+            outcome, refused = check_many(club, requested, now, booked=booked)
+            if outcome == BOOKED:
+                def apply():
+                    for competition, places in requested:
+                        competition.number_of_places -= places
+                        club.points -= places
+                        self._record_taken('competition', competition.name, places)
+                        self._record_taken('club', club.name, places)
+                        self.ledger.record(club.name, competition.name, places, now)
+                if self.journal is None:
+                    apply()
+                else:
+                    # one entry for the whole batch, so a crash cannot keep only part of it
+                    entry = {'club': club.name, 'items': [[c.name, places] for c, places in requested],
+                             'at': now.strftime(DATE_FORMAT)}
+                    seq = self.journal.append(entry, apply=apply)
+        if seq is not None:
+            self.journal.wait(seq)
+        return outcome, refused
+
+    def _record_taken(self, kind, name, places):
+        key = (kind, name)
+        self.taken[key] = self.taken.get(key, 0) + places
+
+
+def merge_items(items):
+    """Sum the places asked for the same competition, keeping first-seen order.
+
+    A competition with an item asking for less than one place gets 0 places,
+    which the rules refuse: a negative item cannot cancel out another one.
+    """
+    requested = {}
+    for competition, places in items:
+        previous = requested.get(competition.name, (competition, None))[1]
+        if places < 1 or previous == 0:
+            places = 0
+        elif previous is not None:
+            places += previous
+        requested[competition.name] = (competition, places)
+    return list(requested.values())
+
+
+def check_many(club, requested, now, booked=None):
+    """Check merged items in order; ``booked`` maps competition names to places the club holds."""
+    booked = booked or {}
+    points = club.points
+    for competition, places in requested:
+        if places < 1:
+            return INVALID_PLACES, competition
+        if now >= competition.date:
+            return PAST_COMPETITION, competition
+        if points < places:
+            return NOT_ENOUGH_POINTS, competition
+        if booked.get(competition.name, 0) + places > MAX_PLACES_PER_BOOKING:
+            return TOO_MANY_PLACES, competition
+        if places > competition.number_of_places:
+            return NOT_ENOUGH_PLACES, competition
+        points -= places
+    return BOOKED, None
+
+
+def check(club, competition, places_required, now, booked=0):
+    """Outcome of the booking rules; ``booked`` is the places the club already holds."""
+    if places_required < 1:
+        return INVALID_PLACES
+    if now >= competition.date:
+        return PAST_COMPETITION
+    if club.points < places_required:
+        return NOT_ENOUGH_POINTS
+    if booked + places_required > MAX_PLACES_PER_BOOKING:
+        return TOO_MANY_PLACES
+    if places_required > competition.number_of_places:
+        return NOT_ENOUGH_PLACES
+    return BOOKED
@@ -0,0 +1,77 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class IdempotencyKeyReused(ValueError):
+    """An idempotency key came back with a different request."""
+
+
+class IdempotencyCache:
+    """Results of recent requests by idempotency key, bounded in size and age.
+
+    The first request with a key runs; a retry with the same key gets the
+    same result back, waiting for it if the first is still running, without
+    running again. Keys are forgotten ``ttl`` seconds after their first use,
+    or once ``max_entries`` newer keys are held, least recently used first.
+    The cache is per process: a retry reaching another worker runs again.
+    """
+
+    def __init__(self, max_entries=10_000, ttl=3600, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def run(self, key, fingerprint, function):
+        """Return ``function()``, or the result it had for an earlier use of ``key``.
+
+        ``fingerprint`` identifies the request; reusing a key for another
+        request raises ``IdempotencyKeyReused``.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires <= self.clock():
+                del self._entries[key]
+                entry = None
+            first = entry is None
+            if first:
+                entry = self._entries[key] = Entry(fingerprint, self.clock() + self.ttl)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.move_to_end(key)
+        if entry.fingerprint != fingerprint:
+            raise IdempotencyKeyReused(key)
+        if not first:
+            entry.done.wait()
+            if entry.failed:
+                # nothing was recorded for the key, so this attempt may run
+                return self.run(key, fingerprint, function)
+            return entry.result
+        try:
+            entry.result = function()
+        except BaseException:
+            entry.failed = True
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            raise
+        finally:
+            entry.done.set()
+        return entry.result
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class Entry:
+    __slots__ = ('fingerprint', 'expires', 'result', 'failed', 'done')
+
+    def __init__(self, fingerprint, expires):
+        self.fingerprint = fingerprint
+        self.expires = expires
+        self.result = None
+        self.failed = False
+        self.done = threading.Event()
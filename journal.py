@@ -0,0 +1,256 @@
+import contextlib
+import glob
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+ALWAYS = 'always'
+BATCHED = 'batched'
+DURABILITY_MODES = (ALWAYS, BATCHED)
+
+
+class JournalFailed(RuntimeError):
+    """A journal write or fsync failed: bookings can no longer be made durable."""
+
+
+class BookingJournal:
+    """Append-only log of bookings, made durable before a booking is confirmed.
+
+    With ``ALWAYS`` durability every booking is fsynced as it is written.
+    With ``BATCHED`` durability a flusher thread fsyncs once every
+    ``batch_ms`` for all the bookings written in between (group commit), and
+    each booking waits for the fsync covering it.
+
+    A failed write or fsync is fatal: the bookings waiting on it and every
+    later append, sync or compaction raise ``JournalFailed``, so state the
+    journal may not hold is never folded into the snapshots. Restarting
+    replays what reached the disk.
+
+    Every entry carries an increasing ``seq``. ``compact`` writes the
+    in-memory state back to the JSON snapshots, tagged with the last ``seq``
+    they include, so replay only applies the entries written after it.
+    """
+
+    def __init__(self, path, durability=BATCHED, batch_ms=2, fsync=os.fsync):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode {durability!r}, expected one of {DURABILITY_MODES}")
+        self.path = path
+        self.durability = durability
+        self.batch_interval = batch_ms / 1000
+        # swapped by servers whose event loop must not block on the disk,
+        # with ``offload``, which runs the snapshot writes of a compaction
+        self.fsync = fsync
+        self.offload = run_here
+        self.last_seq = max((entry['seq'] for entry in read_entries(path)), default=0)
+        self.synced_seq = self.last_seq
+        self.error = None
+        truncate_torn_tail(path)
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._synced = threading.Condition()
+        self._pending = threading.Event()
+        self._closed = threading.Event()
+        self._file = open(path, 'a')
+        if durability == BATCHED:
+            threading.Thread(target=self._flush_batches, daemon=True).start()
+
+    def append(self, entry, apply=None):
+        """Write a booking entry and return its ``seq``.
+
+        ``apply`` mutates the in-memory state under the journal lock, so a
+        compaction snapshot never holds a booking that its ``seq`` misses. It
+        runs once the entry is written, and not at all if writing fails.
+        Call ``wait`` with the returned ``seq`` before confirming the booking.
+        """
+        with self._lock:
+            self._raise_if_failed()
+            seq = self.last_seq + 1
+            try:
+                self._file.write(json.dumps(dict(entry, seq=seq)) + '\n')
+                if self.durability == ALWAYS:
+                    self._file.flush()
+                    self.fsync(self._file.fileno())
+            except Exception as error:
+                self._fail(error)
+            self.last_seq = seq
+            if apply is not None:
+                apply()
+            if self.durability == ALWAYS:
+                self.synced_seq = seq
+            else:
+                self._pending.set()
+        return seq
+
+    def wait(self, seq):
+        with self._synced:
+            self._synced.wait_for(lambda: self.synced_seq >= seq or self.error is not None)
+            if self.synced_seq < seq:
+                self._raise_if_failed()
+
+    def sync(self):
+        with self._sync_lock:
+            self._raise_if_failed()
+            try:
+                with self._lock:
+                    seq = self.last_seq
+                    self._file.flush()
+                self.fsync(self._file.fileno())
+            except Exception as error:
+                self._fail(error)
+            self._mark_synced(seq)
+
+    def compact(self, snapshot, write):
+        """Fold the journal into the JSON snapshots.
+
+        ``snapshot()`` captures the in-memory state and ``write(state, seq)``
+        persists it; the journal segment it covers is deleted afterwards.
+        """
+        with self._sync_lock, self._lock:
+            self._raise_if_failed()
+            seq = self.last_seq
+            state = snapshot()
+            self._file.flush()
+            self.fsync(self._file.fileno())
+            self._file.close()
+            segment = f'{self.path}.{seq}'
+            os.replace(self.path, segment)
+            self._file = open(self.path, 'a')
+            # keeps the seq counter going once the covered segments are gone
+            self._file.write(json.dumps({'seq': seq, 'checkpoint': True}) + '\n')
+            self._file.flush()
+            self.fsync(self._file.fileno())
+        self._mark_synced(seq)
+        self.offload(write, state, seq)
+        for old_segment in segments(self.path):
+            if segment_seq(old_segment) <= seq:
+                os.remove(old_segment)
+        return seq
+
+    def compact_every(self, seconds, snapshot, write, guard=contextlib.nullcontext):
+        """Compact every ``seconds`` while bookings come in, each compaction
+        run inside ``guard()``."""
+        def run():
+            compacted_seq = self.last_seq
+            while not self._closed.wait(seconds) and self.error is None:
+                if self.last_seq != compacted_seq:
+                    try:
+                        with guard():
+                            compacted_seq = self.compact(snapshot, write)
+                    except Exception:
+                        # the journal keeps every booking, the next compaction retries
+                        logger.exception('Compacting the booking journal %s failed', self.path)
+        threading.Thread(target=run, daemon=True).start()
+
+    def close(self):
+        self._closed.set()
+        self._pending.set()
+        try:
+            self.sync()
+        finally:
+            self._file.close()
+
+    def _mark_synced(self, seq):
+        with self._synced:
+            self.synced_seq = max(self.synced_seq, seq)
+            self._synced.notify_all()
+
+    def _flush_batches(self):
+        while not self._closed.is_set():
+            self._pending.wait()
+            # give concurrent bookings the batch window to join this fsync
+            if self._closed.wait(self.batch_interval):
+                return
+            self._pending.clear()
+            try:
+                self.sync()
+            except JournalFailed:
+                return
+
+    def _fail(self, error):
+        # a write or fsync that failed once cannot be trusted to cover the same writes again
+        logger.error('Writing the booking journal %s failed, refusing bookings', self.path, exc_info=error)
+        with self._synced:
+            self.error = error
+            self._synced.notify_all()
+        self._raise_if_failed()
+
+    def _raise_if_failed(self):
+        if self.error is not None:
+            raise JournalFailed(f'Writing the booking journal {self.path} failed') from self.error
+
+
+def segments(path):
+    candidates = glob.glob(glob.escape(path) + '.*')
+    return sorted((c for c in candidates if c.rsplit('.', 1)[1].isdigit()), key=segment_seq)
+
+
+def segment_seq(segment):
+    return int(segment.rsplit('.', 1)[1])
+
+
+def read_entries(path):
+    for file_path in segments(path) + [path]:
+        if not os.path.exists(file_path):
+            continue
+        with open(file_path) as journal_file:
+            for line in journal_file:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # torn write from a crash, never acknowledged
+                    break
+
+
+def truncate_torn_tail(path):
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb+') as journal_file:
+        content = journal_file.read()
+        if content and not content.endswith(b'\n'):
+            journal_file.truncate(content.rfind(b'\n') + 1)
+
+
+def replay(records, path, since_seq, kind, field):
+    """Apply the bookings journaled after ``since_seq`` to loaded records.
+
+    ``kind`` names the entry key matching the records (``'club'`` or
+    ``'competition'``) and ``field`` the counter the booking decremented.
+    """
+    by_name = {record['name']: record for record in records}
+    for single in bookings_since(path, since_seq):
+        record = by_name.get(single[kind])
+        if record is not None:
+            record[field] -= single['places']
+    return records
+
+
+def bookings_since(path, since_seq):
+    """Single bookings journaled after ``since_seq``, batches split up."""
+    for entry in read_entries(path):
+        if entry['seq'] <= since_seq or entry.get('checkpoint'):
+            continue
+        yield from entry_bookings(entry)
+
+
+def entry_bookings(entry):
+    """Single bookings of an entry, which may hold a whole batch."""
+    if 'items' not in entry:
+        return [entry]
+    return [{'club': entry['club'], 'competition': name, 'places': places, 'at': entry.get('at')}
+            for name, places in entry['items']]
+
+
+def run_here(function, *args):
+    return function(*args)
+
+
+def write_snapshot(path, key, records, seq, fsync=os.fsync):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as snapshot_file:
+        json.dump({key: records, 'journal_seq': seq}, snapshot_file, indent=4)
+        snapshot_file.flush()
+        fsync(snapshot_file.fileno())
+    os.replace(tmp_path, path)
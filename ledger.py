@@ -0,0 +1,58 @@
+from models import Booking
+
+
+class BookingLedger:
+    """Every booking made, with per-club and per-competition totals.
+
+    ``append`` updates the totals along with the history, so totals and
+    the places a club already holds in a competition are read in O(1)
+    whatever the number of bookings. Callers serialize appends for the same
+    club and competition, as the booking engine's locks do.
+    """
+
+    def __init__(self, bookings=()):
+        self._history = {}
+        self._booked = {}
+        self._club_totals = {}
+        self._competition_totals = {}
+        for entry in bookings:
+            self.append(entry)
+
+    def append(self, entry):
+        self._history.setdefault(entry.club, []).append(entry)
+        key = (entry.club, entry.competition)
+        first_booking = key not in self._booked
+        self._booked[key] = self._booked.get(key, 0) + entry.places
+        club_totals = self._club_totals.setdefault(entry.club, {'bookings': 0, 'places': 0, 'competitions': 0})
+        club_totals['bookings'] += 1
+        club_totals['places'] += entry.places
+        competition_totals = self._competition_totals.setdefault(
+            entry.competition, {'bookings': 0, 'places': 0, 'clubs': 0})
+        competition_totals['bookings'] += 1
+        competition_totals['places'] += entry.places
+        if first_booking:
+            club_totals['competitions'] += 1
+            competition_totals['clubs'] += 1
+
+    def record(self, club_name, competition_name, places, booked_at):
+        self.append(Booking(club_name, competition_name, places, booked_at))
+
+    def booked(self, club_name, competition_name):
+        """Places the club already booked in the competition."""
+        return self._booked.get((club_name, competition_name), 0)
+
+    def history(self, club_name):
+        return list(self._history.get(club_name, ()))
+
+    def club_totals(self, club_name):
+        return dict(self._club_totals.get(club_name, {'bookings': 0, 'places': 0, 'competitions': 0}))
+
+    def competition_totals(self, competition_name):
+        return dict(self._competition_totals.get(competition_name, {'bookings': 0, 'places': 0, 'clubs': 0}))
+
+    def __iter__(self):
+        for history in list(self._history.values()):
+            yield from list(history)
+
+    def __len__(self):
+        return sum(totals['bookings'] for totals in list(self._club_totals.values()))
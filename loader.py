@@ -0,0 +1,159 @@
+import json
+import logging
+import threading
+
+from registry import Registry
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1 << 16
+WHITESPACE = ' \t\n\r'
+DECODER = json.JSONDecoder()
+LOOKUP_POLL_INTERVAL = 0.001
+
+
+def load_records(path, key, from_dict, into, chunk_size=CHUNK_SIZE):
+    """Stream the ``key`` array of a JSON data file into ``into``.
+
+    Each element is decoded, converted with ``from_dict`` and appended as
+    soon as it is read, so only one chunk of the file and one record are in
+    flight at a time instead of the whole document. The other top-level
+    fields, such as ``journal_seq``, are returned as a dict.
+    """
+    fields = {}
+    with open(path) as data_file:
+        reader = ChunkReader(data_file, chunk_size)
+        reader.expect('{')
+        if reader.peek() == '}':
+            reader.expect('}')
+            return fields
+        while True:
+            name = reader.decode()
+            reader.expect(':')
+            if name == key:
+                reader.expect('[')
+                if reader.peek() == ']':
+                    reader.expect(']')
+                else:
+                    while True:
+                        into.append(from_dict(reader.decode()))
+                        if reader.expect(',', ']') == ']':
+                            break
+            else:
+                fields[name] = reader.decode()
+            if reader.expect(',', '}') == '}':
+                return fields
+
+
+class ChunkReader:
+    """Reads JSON values one at a time from a file, a chunk at a time."""
+
+    def __init__(self, data_file, chunk_size=CHUNK_SIZE):
+        self.file = data_file
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.position = 0
+        self.eof = False
+
+    def peek(self):
+        """Next non-whitespace character, or '' at the end of the file."""
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer) or not self._read_chunk():
+                return self.buffer[self.position:self.position + 1]
+
+    def expect(self, *tokens):
+        token = self.peek()
+        if token not in tokens or not token:
+            raise ValueError(f'Expected one of {tokens} in {self.file.name}, got {token!r}')
+        self.position += 1
+        return token
+
+    def decode(self):
+        self.peek()
+        while True:
+            try:
+                value, end = DECODER.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                if not self._read_chunk():
+                    raise
+                continue
+            # a number cut by the chunk boundary decodes fine, so wait for what follows it
+            if end == len(self.buffer) and self._read_chunk():
+                continue
+            self.position = end
+            return value
+
+    def _read_chunk(self):
+        if self.eof:
+            return False
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+
+class LoadingRegistry(Registry):
+    """Registry filled by a background thread while it is already in use.
+
+    A lookup answers as soon as the record it asks for has been read; an
+    unknown key, and anything that needs every record (iteration, length,
+    slices), waits for the load to finish.
+    """
+
+    def __init__(self, keys=('name',)):
+        super().__init__(keys=keys)
+        self._loaded = threading.Event()
+        self.error = None
+
+    def load(self, fill):
+        """Run ``fill(self)`` on a background thread and return the registry."""
+        def run():
+            try:
+                fill(self)
+            except Exception as error:
+                logger.exception('Loading records failed')
+                self.error = error
+            finally:
+                self._loaded.set()
+        threading.Thread(target=run, daemon=True).start()
+        return self
+
+    def wait(self):
+        self._loaded.wait()
+        if self.error is not None:
+            raise RuntimeError('Records could not be loaded') from self.error
+
+    def get(self, key, value, default=None):
+        record = super().get(key, value)
+        # the record may not have been read yet: look again until the load ends
+        while record is None and not self._loaded.wait(LOOKUP_POLL_INTERVAL):
+            record = super().get(key, value)
+        if record is None:
+            self.wait()
+            record = super().get(key, value)
+        return default if record is None else record
+
+    def __iter__(self):
+        self.wait()
+        return super().__iter__()
+
+    def __len__(self):
+        self.wait()
+        return super().__len__()
+
+    def __getitem__(self, position):
+        self.wait()
+        return super().__getitem__(position)
+
+    def __contains__(self, record):
+        self.wait()
+        return super().__contains__(record)
+
+    def __eq__(self, other):
+        self.wait()
+        return super().__eq__(other)
@@ -0,0 +1,98 @@
+from datetime import datetime
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class Record:
+    """Typed record parsed once from its JSON mapping.
+
+    Fields are read and written by attribute or, like the JSON dicts they
+    replace, by key: templates, registries and the booking engine keep using
+    ``club['points']``.
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.__slots__)
+
+    __hash__ = None
+
+    def __repr__(self):
+        fields = ', '.join(f'{field}={getattr(self, field)!r}' for field in self.__slots__)
+        return f'{type(self).__name__}({fields})'
+
+
+class Club(Record):
+    __slots__ = ('name', 'email', 'points')
+
+    def __init__(self, name, email, points):
+        self.name = name
+        self.email = email
+        self.points = points
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['name'], data['email'], int(data['points']))
+
+    def to_dict(self):
+        return {'name': self.name, 'email': self.email, 'points': str(self.points)}
+
+
+class Competition(Record):
+    __slots__ = ('name', 'date', 'number_of_places')
+
+    def __init__(self, name, date, number_of_places):
+        self.name = name
+        self.date = date
+        self.number_of_places = number_of_places
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['name'], datetime.strptime(data['date'], DATE_FORMAT), int(data['number_of_places']))
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'date': self.date.strftime(DATE_FORMAT),
+            'number_of_places': str(self.number_of_places),
+        }
+
+
+class Booking(Record):
+    """One booking of the ledger; ``booked_at`` is None for bookings journaled without a time."""
+
+    __slots__ = ('club', 'competition', 'places', 'booked_at')
+
+    def __init__(self, club, competition, places, booked_at):
+        self.club = club
+        self.competition = competition
+        self.places = places
+        self.booked_at = booked_at
+
+    @classmethod
+    def from_dict(cls, data):
+        booked_at = data.get('booked_at')
+        return cls(data['club'], data['competition'], int(data['places']),
+                   booked_at and datetime.strptime(booked_at, DATE_FORMAT))
+
+    def to_dict(self):
+        return {
+            'club': self.club,
+            'competition': self.competition,
+            'places': self.places,
+            'booked_at': self.booked_at and self.booked_at.strftime(DATE_FORMAT),
+        }
@@ -0,0 +1,69 @@
+import cProfile
+import io
+import os
+import pstats
+import random
+import threading
+
+
+class RequestProfiler:
+    """Profiles a sampled fraction of requests with cProfile.
+
+    Stats are aggregated per endpoint, so a few hundred sampled requests show
+    whether rendering, lookups or bookings dominate a route. Only one request
+    is profiled at a time; others are let through unprofiled, which keeps the
+    overhead bounded whatever the sample rate.
+    """
+
+    def __init__(self, sample_rate, output_dir=None):
+        if not 0 <= sample_rate <= 1:
+            raise ValueError(f"Sample rate must be between 0 and 1, got {sample_rate}")
+        self.sample_rate = sample_rate
+        self.output_dir = output_dir
+        self._stats = {}
+        self._samples = {}
+        self._profiling = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+    def start(self):
+        """Return a running profile if this request is sampled, else ``None``."""
+        if random.random() >= self.sample_rate or not self._profiling.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # another profiler is already attached to the interpreter
+            self._profiling.release()
+            return None
+        return profile
+
+    def stop(self, profile, endpoint):
+        profile.disable()
+        self._profiling.release()
+        with self._stats_lock:
+            stats = self._stats.get(endpoint)
+            if stats is None:
+                self._stats[endpoint] = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+            self._samples[endpoint] = self._samples.get(endpoint, 0) + 1
+            if self.output_dir:
+                self._dump(endpoint)
+
+    def samples(self):
+        return dict(self._samples)
+
+    def report(self, endpoint, sort='cumulative', limit=40):
+        with self._stats_lock:
+            stats = self._stats.get(endpoint)
+            if stats is None:
+                return None
+            output = io.StringIO()
+            stats.stream = output
+            stats.sort_stats(sort).print_stats(limit)
+        return output.getvalue()
+
+    def _dump(self, endpoint):
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._stats[endpoint].dump_stats(os.path.join(self.output_dir, f'{endpoint}.prof'))
@@ -0,0 +1,68 @@
+import threading
+import time
+from collections import OrderedDict
+
+SHARDS = 64
+
+
+class RateLimitBackend:
+    """Where token buckets are kept; other backends (e.g. shared between
+    workers) implement ``take`` atomically for the key."""
+
+    def take(self, key, rate, burst, now):
+        """Take a token from the bucket of ``key``.
+
+        The bucket holds up to ``burst`` tokens and gains ``rate`` per
+        second. Return 0 if a token was taken, else the seconds until one is
+        available, taking nothing.
+        """
+        raise NotImplementedError
+
+
+class MemoryBackend(RateLimitBackend):
+    """Token buckets of this process, spread over ``shards`` locks.
+
+    Keys are split between shards by hash, so concurrent requests only
+    contend when their keys share a shard. Each shard keeps its buckets in
+    an ordered dict and drops the least recently used one past
+    ``max_keys / shards``, which bounds the memory whatever the number of
+    addresses or emails tried; a dropped bucket comes back full.
+    """
+
+    def __init__(self, shards=SHARDS, max_keys=100_000):
+        self._shards = [(threading.Lock(), OrderedDict()) for _ in range(shards)]
+        self.max_keys_per_shard = max(1, max_keys // shards)
+
+    def take(self, key, rate, burst, now):
+        lock, buckets = self._shards[hash(key) % len(self._shards)]
+        with lock:
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = [float(burst), now]
+                while len(buckets) > self.max_keys_per_shard:
+                    buckets.popitem(last=False)
+            else:
+                buckets.move_to_end(key)
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0
+            return (1 - bucket[0]) / rate
+
+    def __len__(self):
+        return sum(len(buckets) for _, buckets in self._shards)
+
+
+class RateLimiter:
+    """Allows each key ``rate`` attempts per second, with bursts of up to ``burst``."""
+
+    def __init__(self, rate, burst=1, backend=None, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.backend = MemoryBackend() if backend is None else backend
+        self.clock = clock
+
+    def hit(self, key):
+        """Count an attempt for ``key``: 0 if allowed, else the seconds to wait."""
+        return self.backend.take(key, self.rate, self.burst, self.clock())
@@ -0,0 +1,58 @@
+class Registry:
+    """Records kept in load order, with a hash index per lookup key.
+
+    Routes look clubs and competitions up with ``get`` in O(1) instead of
+    scanning the whole list. ``append`` and ``remove`` keep every index in
+    sync; the indexed fields themselves (``name``, ``email``) are treated as
+    immutable once a record is registered.
+    """
+
+    def __init__(self, records=(), keys=('name',)):
+        self._records = []
+        self._indexes = {key: {} for key in keys}
+        for record in records:
+            self.append(record)
+
+    def get(self, key, value, default=None):
+        return self._indexes[key].get(value, default)
+
+    def append(self, record):
+        self._records.append(record)
+        for key, index in self._indexes.items():
+            # first match wins, like the list scans this replaces
+            index.setdefault(record[key], record)
+
+    def remove(self, record):
+        position = next((i for i, registered in enumerate(self._records) if registered is record), None)
+        if position is None:
+            raise ValueError(f'{record!r} is not registered')
+        del self._records[position]
+        for key, index in self._indexes.items():
+            value = record[key]
+            if index.get(value) is record:
+                del index[value]
+                duplicate = next((r for r in self._records if r[key] == value), None)
+                if duplicate is not None:
+                    index[value] = duplicate
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def __len__(self):
+        return len(self._records)
+
+    def __getitem__(self, position):
+        return self._records[position]
+
+    def __contains__(self, record):
+        return record in self._records
+
+    def __eq__(self, other):
+        if isinstance(other, Registry):
+            return self._records == other._records
+        if isinstance(other, list):
+            return self._records == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f'Registry({self._records!r})'
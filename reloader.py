@@ -0,0 +1,62 @@
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class FileWatcher:
+    """Calls ``on_change`` from a background thread when watched files change.
+
+    Files are polled every ``interval`` seconds and compared on their
+    modification time and size. A change is only marked as seen once
+    ``on_change`` succeeds, so a file caught half-written is picked up again
+    on the next poll. ``mark_seen`` keeps the app's own writes from being
+    taken for changes.
+    """
+
+    def __init__(self, paths, on_change, interval=1.0):
+        self.paths = list(paths)
+        self.on_change = on_change
+        self.interval = interval
+        self._stamps = self._read_stamps()
+        self._stopped = threading.Event()
+
+    def check(self):
+        """Run ``on_change`` if any file changed since the last check."""
+        stamps = self._read_stamps()
+        if stamps == self._stamps:
+            return False
+        seen = self._stamps
+        self.on_change()
+        # marked seen meanwhile: the files were rewritten after ``stamps`` was read
+        if self._stamps is seen:
+            self._stamps = stamps
+        return True
+
+    def mark_seen(self):
+        """Take the files as they are now as seen, e.g. after the app wrote them."""
+        self._stamps = self._read_stamps()
+
+    def start(self):
+        def run():
+            while not self._stopped.wait(self.interval):
+                try:
+                    self.check()
+                except Exception:
+                    logger.exception('Reloading %s failed', ', '.join(self.paths))
+        threading.Thread(target=run, daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _read_stamps(self):
+        return [file_stamp(path) for path in self.paths]
+
+
+def file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
@@ -0,0 +1,40 @@
+from jinja2 import ChoiceLoader, ModuleLoader
+
+
+class FragmentCache:
+    """Rendered page fragments, reused until the data version changes.
+
+    Only the latest version of each fragment is kept: a booking bumps the
+    storage version and the next request renders the fragment again.
+    """
+
+    def __init__(self):
+        self._fragments = {}
+
+    def get(self, name, version, render):
+        cached = self._fragments.get(name)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        fragment = render()
+        self._fragments[name] = (version, fragment)
+        return fragment
+
+    def clear(self):
+        self._fragments.clear()
+
+
+def compile_templates(app, target):
+    """Compile every template of the app into a Python module under ``target``."""
+    # compiled from the sources even when the app already loads compiled templates
+    environment = app.jinja_env.overlay(loader=app.create_global_jinja_loader())
+    environment.compile_templates(target, zip=None, ignore_errors=False)
+
+
+def use_compiled_templates(app, path):
+    """Load templates from the modules in ``path``, skipping their compilation.
+
+    Templates missing from ``path`` are still compiled from their sources.
+    The modules are not checked against the sources: compile them again
+    whenever the templates change.
+    """
+    app.jinja_env.loader = ChoiceLoader([ModuleLoader(path), app.jinja_env.loader])
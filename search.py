@@ -0,0 +1,70 @@
+import bisect
+
+# sorts after any character a competition name can continue with
+PREFIX_END = '\U0010ffff'
+
+
+class CompetitionIndex:
+    """Competitions sorted by date and by name, searched with bisect.
+
+    A query narrows the dates or the name prefix to a slice of one sorted
+    list in O(log n), then filters only that slice. Places are read from
+    the records when querying, so bookings never make the index stale;
+    build a new one when the competitions themselves change.
+    """
+
+    def __init__(self, competitions):
+        self.competitions = competitions
+        self._by_date = sorted(competitions, key=lambda competition: competition.date)
+        self._dates = [competition.date for competition in self._by_date]
+        self._by_name = sorted(competitions, key=lambda competition: competition.name.casefold())
+        self._names = [competition.name.casefold() for competition in self._by_name]
+
+    def query(self, after=None, start=None, end=None, prefix=None, has_places=False):
+        """Competitions in date order matching every given criterion.
+
+        ``after`` keeps the competitions strictly later than it (upcoming
+        ones, with the current time), ``start`` and ``end`` bound the date
+        range (``start`` included, ``end`` excluded), ``prefix`` matches the
+        start of the name whatever its case, and ``has_places`` keeps the
+        competitions with places left.
+        """
+        low = 0 if start is None else bisect.bisect_left(self._dates, start)
+        if after is not None:
+            low = max(low, bisect.bisect_right(self._dates, after))
+        high = len(self._dates) if end is None else bisect.bisect_left(self._dates, end)
+        if prefix:
+            folded = prefix.casefold()
+            first = bisect.bisect_left(self._names, folded)
+            last = bisect.bisect_left(self._names, folded + PREFIX_END)
+            if last - first < high - low:
+                # fewer names than dates to check: filter the prefix slice on the dates
+                dates = (self._dates[low], self._dates[high - 1]) if low < high else None
+                matches = sorted((competition for competition in self._by_name[first:last]
+                                  if dates and dates[0] <= competition.date <= dates[1]),
+                                 key=lambda competition: competition.date)
+            else:
+                matches = [competition for competition in self._by_date[low:high]
+                           if competition.name.casefold().startswith(folded)]
+        else:
+            matches = self._by_date[low:high]
+        if has_places:
+            matches = [competition for competition in matches if competition.number_of_places > 0]
+        return list(matches)
+
+    def past_count(self, now):
+        """Number of competitions that took place by ``now``."""
+        return bisect.bisect_right(self._dates, now)
+
+
+class IndexCache:
+    """The index of the latest competitions list, built again when the list changes."""
+
+    def __init__(self):
+        self._index = None
+
+    def get(self, competitions):
+        index = self._index
+        if index is None or index.competitions is not competitions:
+            index = self._index = CompetitionIndex(competitions)
+        return index
@@ -1,86 +1,581 @@
-from http.client import INTERNAL_SERVER_ERROR
+import click
+from contextlib import contextmanager
 import json
-from flask import Flask, render_template, request, redirect, flash, url_for, abort
+from flask import Flask, Response, render_template, request, redirect, flash, url_for, abort, stream_with_context
+from flask import g, before_render_template, template_rendered
+from markupsafe import Markup, escape
 from datetime import date, datetime
 import os
+import secrets
+import threading
+import time
+
+import booking
+import journal
+import loader
+import metrics
+from booking import BookingEngine
+from idempotency import IdempotencyCache, IdempotencyKeyReused
+from journal import BookingJournal, JournalFailed
+from loader import LoadingRegistry
+from metrics import InstrumentedStorage, Metrics
+from ledger import BookingLedger
+from models import DATE_FORMAT, Booking, Club, Competition
+from ratelimit import MemoryBackend, RateLimiter
+from registry import Registry
+from reloader import FileWatcher
+from rendering import FragmentCache, compile_templates, use_compiled_templates
+from search import IndexCache
+from storage import JsonStorage, SharedMemoryStorage, SqliteStorage
+from waitlist import AdmissionQueue, WaitlistManager
 
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
-CLUBS_PATH = os.path.join(ROOT_DIR, 'clubs.json')
-COMPETITIONS_PATH = os.path.join(ROOT_DIR, 'competitions.json')
+CLUBS_PATH = os.environ.get('GUDLFT_CLUBS_PATH', os.path.join(ROOT_DIR, 'clubs.json'))
+COMPETITIONS_PATH = os.environ.get('GUDLFT_COMPETITIONS_PATH', os.path.join(ROOT_DIR, 'competitions.json'))
+BOOKINGS_PATH = os.environ.get('GUDLFT_BOOKINGS_PATH', os.path.join(ROOT_DIR, 'bookings.json'))
+# 'json' keeps the data in memory per process, 'sqlite' shares it between workers,
+# 'shared' shares points and places between the workers forked from one server
+STORAGE_BACKEND = os.environ.get('GUDLFT_STORAGE', 'json')
+SQLITE_PATH = os.environ.get('GUDLFT_SQLITE_PATH', os.path.join(ROOT_DIR, 'gudlft.sqlite3'))
+# bookings are only kept in memory unless a journal path is configured
+JOURNAL_PATH = os.environ.get('GUDLFT_JOURNAL_PATH')
+JOURNAL_DURABILITY = os.environ.get('GUDLFT_JOURNAL_DURABILITY', journal.BATCHED)
+JOURNAL_BATCH_MS = float(os.environ.get('GUDLFT_JOURNAL_BATCH_MS', 2))
+COMPACTION_INTERVAL = float(os.environ.get('GUDLFT_COMPACTION_INTERVAL', 60))
+# fraction of requests run under cProfile, 0 turns profiling off
+PROFILE_SAMPLE_RATE = float(os.environ.get('GUDLFT_PROFILE_SAMPLE_RATE', 0))
+PROFILE_DIR = os.environ.get('GUDLFT_PROFILE_DIR')
+PROFILE_TOKEN = os.environ.get('GUDLFT_PROFILE_TOKEN')
+# seconds between checks for edits to the JSON files, 0 turns hot reload off
+RELOAD_INTERVAL = float(os.environ.get('GUDLFT_RELOAD_INTERVAL', 0))
+# serve requests while the JSON files are still being read (without a journal)
+LAZY_LOAD = os.environ.get('GUDLFT_LAZY_LOAD', '0') == '1'
+# retries of a purchase carrying the same Idempotency-Key header are answered from this cache
+IDEMPOTENCY_TTL = float(os.environ.get('GUDLFT_IDEMPOTENCY_TTL', 3600))
+IDEMPOTENCY_MAX_KEYS = int(os.environ.get('GUDLFT_IDEMPOTENCY_MAX_KEYS', 10000))
+# bookings let through per second when a competition opens, 0 lets them all through
+ADMISSION_RATE = float(os.environ.get('GUDLFT_ADMISSION_RATE', 0))
+ADMISSION_BURST = int(os.environ.get('GUDLFT_ADMISSION_BURST', 10))
+ADMISSION_MAX_WAIT = float(os.environ.get('GUDLFT_ADMISSION_MAX_WAIT', 5))
+WAITLIST_MAX = int(os.environ.get('GUDLFT_WAITLIST_MAX', 1000))
+# login attempts per minute, per client IP and per email; 0 turns the limit off
+LOGIN_RATE_PER_IP = float(os.environ.get('GUDLFT_LOGIN_RATE_PER_IP', 0))
+LOGIN_RATE_PER_EMAIL = float(os.environ.get('GUDLFT_LOGIN_RATE_PER_EMAIL', 0))
+LOGIN_BURST = int(os.environ.get('GUDLFT_LOGIN_BURST', 5))
+# templates compiled ahead of time by `flask compile-templates`
+TEMPLATE_CACHE_DIR = os.environ.get('GUDLFT_TEMPLATE_CACHE')
+
+def read_snapshot(path, key, record_type, records):
+    """Stream a JSON data file into ``records``; return the journal ``seq`` it includes."""
+    return loader.load_records(path, key, record_type.from_dict, records).get('journal_seq', 0)
+
+
+def load_clubs(list_of_clubs=None):
+    list_of_clubs = [] if list_of_clubs is None else list_of_clubs
+    seq = read_snapshot(CLUBS_PATH, 'clubs', Club, list_of_clubs)
+    if JOURNAL_PATH:
+        journal.replay(list_of_clubs, JOURNAL_PATH, seq, 'club', 'points')
+    return list_of_clubs
+
+
+def load_competitions(list_of_competitions=None):
+    list_of_competitions = [] if list_of_competitions is None else list_of_competitions
+    seq = read_snapshot(COMPETITIONS_PATH, 'competitions', Competition, list_of_competitions)
+    if JOURNAL_PATH:
+        journal.replay(list_of_competitions, JOURNAL_PATH, seq, 'competition', 'number_of_places')
+    return list_of_competitions
+
+
+def load_ledger():
+    """Bookings ledger from the bookings snapshot, if any, and the journal."""
+    ledger = BookingLedger()
+    seq = 0
+    if os.path.exists(BOOKINGS_PATH):
+        seq = loader.load_records(BOOKINGS_PATH, 'bookings', Booking.from_dict, ledger).get('journal_seq', 0)
+    if JOURNAL_PATH:
+        for single in journal.bookings_since(JOURNAL_PATH, seq):
+            at = single.get('at')
+            ledger.record(single['club'], single['competition'], single['places'],
+                          at and datetime.strptime(at, DATE_FORMAT))
+    return ledger
+
+
+def load_registries():
+    """Clubs and competitions registries, indexed while the files are read."""
+    if not LAZY_LOAD:
+        return load_clubs(Registry(keys=('name', 'email'))), load_competitions(Registry(keys=('name',)))
+    if JOURNAL_PATH:
+        raise ValueError('GUDLFT_LAZY_LOAD cannot be used with GUDLFT_JOURNAL_PATH: '
+                         'bookings would be checked before the journal is replayed')
+    return (LoadingRegistry(keys=('name', 'email')).load(load_clubs),
+            LoadingRegistry(keys=('name',)).load(load_competitions))
+
+
+def snapshot_data():
+    clubs = [club.to_dict() for club in STORAGE.clubs()]
+    competitions = [comp.to_dict() for comp in STORAGE.competitions()]
+    bookings = [entry.to_dict() for entry in LEDGER]
+    return clubs, competitions, bookings
+
 
-def load_clubs():   
-    with open(CLUBS_PATH) as c:
-         list_of_clubs = json.load(c)['clubs']
-         return list_of_clubs
+def write_snapshots(data, seq):
+    clubs, competitions, bookings = data
+    journal.write_snapshot(CLUBS_PATH, 'clubs', clubs, seq, fsync=JOURNAL.fsync)
+    journal.write_snapshot(COMPETITIONS_PATH, 'competitions', competitions, seq, fsync=JOURNAL.fsync)
+    journal.write_snapshot(BOOKINGS_PATH, 'bookings', bookings, seq, fsync=JOURNAL.fsync)
+    if WATCHER is not None:
+        WATCHER.mark_seen()
 
 
-def load_competitions():
-    with open(COMPETITIONS_PATH) as comps:
-         list_of_competitions = json.load(comps)['competitions']
-         return list_of_competitions
+@contextmanager
+def data_files_held():
+    """Hold the data files for a whole compaction, from snapshot to write.
+
+    A reload cannot swap registries in between, which would have the
+    snapshot of the old ones written over the files just reloaded, and
+    edits not reloaded yet are reloaded first so the snapshot keeps them.
+    """
+    with DATA_FILES_LOCK:
+        if WATCHER is not None:
+            WATCHER.check()
+        yield
+
+
+def reload_data():
+    """Load the JSON files again and swap them into the running storage.
+
+    Parsing happens on the watcher thread while requests keep being served
+    from the previous snapshot. Holding the files lock keeps a compaction
+    from snapshotting the registries being replaced, rewriting the files,
+    and dropping the journal segments the replay needs, until the swap is
+    done.
+    """
+    with DATA_FILES_LOCK:
+        clubs = Registry(keys=('name', 'email'))
+        competitions = Registry(keys=('name',))
+        clubs_seq = read_snapshot(CLUBS_PATH, 'clubs', Club, clubs)
+        competitions_seq = read_snapshot(COMPETITIONS_PATH, 'competitions', Competition, competitions)
+        replay = None
+        if JOURNAL is not None:
+            def replay(clubs, competitions):
+                JOURNAL.sync()
+                journal.replay(clubs, JOURNAL_PATH, clubs_seq, 'club', 'points')
+                journal.replay(competitions, JOURNAL_PATH, competitions_seq, 'competition', 'number_of_places')
+        STORAGE.reload(clubs, competitions, replay=replay)
+    app.logger.info('Reloaded %d clubs and %d competitions', len(clubs), len(competitions))
+    # the new files may have added places to sold-out competitions
+    if WAITLIST is not None:
+        WAITLIST.admit_all(STORAGE)
 
 
 app = Flask(__name__)
 app.secret_key = 'something_special'
+if TEMPLATE_CACHE_DIR:
+    use_compiled_templates(app, TEMPLATE_CACHE_DIR)
+
+
+@app.cli.command('compile-templates')
+@click.argument('target', default=TEMPLATE_CACHE_DIR or os.path.join(ROOT_DIR, 'build', 'templates'))
+def compile_templates_command(target):
+    """Compile the templates into TARGET, to be loaded with GUDLFT_TEMPLATE_CACHE."""
+    compile_templates(app, target)
+    click.echo(f'Templates compiled into {target}')
+
+JOURNAL = None
+LEDGER = None
+WATCHER = None
+# reentrant: a compaction reloads pending edits while holding it
+DATA_FILES_LOCK = threading.RLock()
+if STORAGE_BACKEND == 'sqlite':
+    STORAGE = SqliteStorage(SQLITE_PATH)
+    if STORAGE.is_empty():
+        STORAGE.import_records(load_clubs(), load_competitions())
+elif STORAGE_BACKEND == 'json':
+    if JOURNAL_PATH:
+        JOURNAL = BookingJournal(JOURNAL_PATH, durability=JOURNAL_DURABILITY, batch_ms=JOURNAL_BATCH_MS)
+        JOURNAL.compact_every(COMPACTION_INTERVAL, snapshot_data, write_snapshots, guard=data_files_held)
+    LEDGER = load_ledger()
+    STORAGE = JsonStorage(*load_registries(), BookingEngine(journal=JOURNAL, ledger=LEDGER))
+    if RELOAD_INTERVAL:
+        WATCHER = FileWatcher([CLUBS_PATH, COMPETITIONS_PATH], reload_data, RELOAD_INTERVAL)
+        WATCHER.start()
+elif STORAGE_BACKEND == 'shared':
+    if JOURNAL_PATH:
+        raise ValueError("GUDLFT_JOURNAL_PATH is not supported by the 'shared' storage backend")
+    STORAGE = SharedMemoryStorage(load_clubs(Registry(keys=('name', 'email'))),
+                                  load_competitions(Registry(keys=('name',))))
+else:
+    raise ValueError(f"Unknown storage backend {STORAGE_BACKEND!r}, expected 'json', 'sqlite' or 'shared'")
+
+METRICS = Metrics()
+STORAGE = InstrumentedStorage(STORAGE, METRICS)
+WAITLIST = None
+if STORAGE_BACKEND == 'json' and RELOAD_INTERVAL:
+    # places only come back when the files are reloaded, and each worker books
+    # its own copy of them, so a waitlist per worker keeps its order
+    WAITLIST = WaitlistManager(max_waiting=WAITLIST_MAX)
+ADMISSION = None
+if ADMISSION_RATE:
+    ADMISSION = AdmissionQueue(ADMISSION_RATE, burst=ADMISSION_BURST, max_wait=ADMISSION_MAX_WAIT)
+RATE_LIMITS = MemoryBackend()
+LOGIN_IP_LIMITER = None
+if LOGIN_RATE_PER_IP:
+    LOGIN_IP_LIMITER = RateLimiter(LOGIN_RATE_PER_IP / 60, burst=LOGIN_BURST, backend=RATE_LIMITS)
+LOGIN_EMAIL_LIMITER = None
+if LOGIN_RATE_PER_EMAIL:
+    LOGIN_EMAIL_LIMITER = RateLimiter(LOGIN_RATE_PER_EMAIL / 60, burst=LOGIN_BURST, backend=RATE_LIMITS)
+IDEMPOTENCY = IdempotencyCache(max_entries=IDEMPOTENCY_MAX_KEYS, ttl=IDEMPOTENCY_TTL)
+PROFILER = None
+if PROFILE_SAMPLE_RATE:
+    # cProfile and pstats are only imported when profiling is on
+    from profiling import RequestProfiler
+    PROFILER = RequestProfiler(PROFILE_SAMPLE_RATE, PROFILE_DIR)
+
+BOOKING_MESSAGES = {
+    booking.BOOKED: 'Great-booking complete !',
+    booking.INVALID_PLACES: "Sorry, you have to take at least one place.",
+    booking.PAST_COMPETITION: "The competition has already taken place on this date : {date}.",
+    booking.NOT_ENOUGH_POINTS: "Sorry, you can't take more places than you have points.",
+    booking.TOO_MANY_PLACES: f"Sorry, you can't take more than {booking.MAX_PLACES_PER_BOOKING} places.",
+    booking.NOT_ENOUGH_PLACES: "Sorry, you can't take more places that are available.",
+    booking.LEDGER_FULL: "Sorry, no more bookings can be recorded for now, please contact us.",
+}
+
+WAITLIST_MESSAGE = "You are number {position} on the waitlist: the places will be booked for you as soon as they free up."
+WAITLIST_FULL_MESSAGE = "The waitlist for this competition is full."
+ADMITTED_MESSAGE = "{places} places were booked for you in {competition} from the waitlist."
+
+POINTS_BOARD_PAGE_SIZE = 20
+POINTS_BOARD_MAX_PAGE_SIZE = 100
+EXPORT_BATCH_SIZE = 500
+
+FRAGMENTS = FragmentCache()
+COMPETITION_INDEX = IndexCache()
+# stands for the logged-in club in the cached competitions listing
+CLUB_PLACEHOLDER = 'GUDLFT-CLUB-PLACEHOLDER'
+
+
+def render_fragment(template_name, **context):
+    with METRICS.timer(metrics.TEMPLATE_RENDER_DURATION, template=template_name):
+        return Markup(app.jinja_env.get_template(template_name).render(**context))
+
+
+def render_clubs_listing():
+    # the first page of the points board only: the summary stays the same size whatever the membership
+    clubs, next_cursor = STORAGE.clubs_page(None, POINTS_BOARD_PAGE_SIZE)
+    return clubs, render_fragment('clubs_listing.html', clubs=clubs, next_cursor=next_cursor)
+
+
+def render_summary(club):
+    version = STORAGE.version()
+    competitions = STORAGE.competitions()
+    # the page is cached with its fragment, so a cached listing costs no lookup
+    clubs, clubs_listing = FRAGMENTS.get('clubs', version, render_clubs_listing)
+    now = datetime.now()
+    index = COMPETITION_INDEX.get(competitions)
+    # only upcoming competitions are listed: one taking place changes the listing too
+    competitions_listing = FRAGMENTS.get('competitions', (version, index.past_count(now)), lambda: render_fragment(
+        'competitions_listing.html', competitions=index.query(after=now), club_name=CLUB_PLACEHOLDER))
+    book_prefix = url_for('book', comp_name='-', club_name='')
+    club_segment = url_for('book', comp_name='-', club_name=club.name)[len(book_prefix):]
+    competitions_listing = Markup(competitions_listing.replace(CLUB_PLACEHOLDER, escape(club_segment)))
+    return render_template('welcome.html', clubs=clubs, club=club, competitions=competitions,
+                           clubs_listing=clubs_listing, competitions_listing=competitions_listing)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    if PROFILER:
+        g.profile = PROFILER.start()
+
+
+@app.before_request
+def refuse_after_journal_failure():
+    # the memory may hold bookings the journal lost: stop serving until a restart replays it
+    if JOURNAL is not None and JOURNAL.error is not None:
+        return journal_failed(JOURNAL.error)
+
+
+@app.after_request
+def record_request_duration(response):
+    # streamed responses are timed up to their first byte
+    duration = time.perf_counter() - g.request_start
+    METRICS.observe(metrics.REQUEST_DURATION, duration, endpoint=request.endpoint or 'unknown')
+    return response
+
+
+@app.teardown_request
+def stop_profile(exception):
+    # teardown also runs when the view raised, so the profiler is always released
+    profile = g.pop('profile', None)
+    if profile:
+        PROFILER.stop(profile, request.endpoint or 'unknown')
+
+
+def start_render_timer(sender, template, context, **extra):
+    g.render_start = time.perf_counter()
+
+
+def record_render_duration(sender, template, context, **extra):
+    duration = time.perf_counter() - g.render_start
+    METRICS.observe(metrics.TEMPLATE_RENDER_DURATION, duration, template=template.name)
+
+
+before_render_template.connect(start_render_timer, app)
+template_rendered.connect(record_render_duration, app)
+
+
+@app.route('/metrics')
+def show_metrics():
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+
+
+def check_profile_access():
+    if PROFILER is None:
+        abort(404)
+    token = request.headers.get('X-Profile-Token', '')
+    if not PROFILE_TOKEN or not secrets.compare_digest(token.encode(), PROFILE_TOKEN.encode()):
+        abort(403)
+
+
+@app.route('/profiles')
+def list_profiles():
+    check_profile_access()
+    samples = PROFILER.samples()
+    return Response(''.join(f'{endpoint} {count}\n' for endpoint, count in sorted(samples.items())),
+                    mimetype='text/plain')
+
+
+@app.route('/profiles/<endpoint>')
+def show_profile(endpoint):
+    check_profile_access()
+    sort = request.args.get('sort', 'cumulative')
+    if sort not in ('cumulative', 'tottime', 'ncalls'):
+        abort(400)
+    report = PROFILER.report(endpoint, sort=sort, limit=request.args.get('limit', 40, type=int))
+    if report is None:
+        abort(404)
+    return Response(report, mimetype='text/plain')
 
-COMPETITIONS = load_competitions()
-CLUBS = load_clubs()
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+def throttle_login(email):
+    """429 once the client IP or the email ran out of login attempts."""
+    retry_after = 0
+    if LOGIN_IP_LIMITER is not None:
+        retry_after = LOGIN_IP_LIMITER.hit(f'ip:{request.remote_addr}')
+    if not retry_after and LOGIN_EMAIL_LIMITER is not None:
+        retry_after = LOGIN_EMAIL_LIMITER.hit(f'email:{email.strip().casefold()}')
+    if retry_after:
+        abort(Response('Too many login attempts, please try again later.', 429,
+                       {'Retry-After': str(max(1, round(retry_after)))}))
+
 @app.route('/show-summary',methods=['POST'])
 def show_summary():
-    try:
-        print(CLUBS)
-        club = [club for club in CLUBS if club['email'] == request.form['email']][0] 
-        return render_template('welcome.html', clubs=CLUBS, club=club, competitions=COMPETITIONS)
-    except IndexError:
+    # before anything is looked up or rendered, so refused attempts stay cheap
+    throttle_login(request.form['email'])
+    app.logger.debug('Login attempt for %s', request.form['email'])
+    club = STORAGE.get_club_by_email(request.form['email'])
+    if not club:
         abort(405)
+    for competition_name, places in WAITLIST.pop_admitted(club.name) if WAITLIST is not None else ():
+        flash(ADMITTED_MESSAGE.format(places=places, competition=competition_name))
+    return render_summary(club)
 
 @app.errorhandler(405)
 def email_not_found(e):
     return render_template("email_not_found.html")
 
+@app.errorhandler(JournalFailed)
+def journal_failed(e):
+    return Response('Bookings are unavailable, yours may not have been recorded. Please try again later.', 503)
+
 @app.route('/book/<comp_name>/<club_name>')
 def book(comp_name,club_name):
-    found_club = next((c for c in CLUBS if c['name'] == club_name), None)
-    found_competition = next((c for c in COMPETITIONS if c['name'] == comp_name), None)
+    found_club = STORAGE.get_club(club_name)
+    found_competition = STORAGE.get_competition(comp_name)
     if not found_club:
         return render_template('index.html')
     if not found_competition:
         flash("Something went wrong-please try again")
-        return render_template('welcome.html', clubs=CLUBS, club=found_club, competitions=COMPETITIONS)
+        return render_summary(found_club)
     else:
         return render_template('booking.html', club=found_club, competition=found_competition)
 
 
+def book_once(fingerprint, book):
+    """Run ``book`` once per Idempotency-Key header, replaying its outcome to retries."""
+    key = request.headers.get('Idempotency-Key')
+    if not key:
+        return book()
+    try:
+        return IDEMPOTENCY.run(key, fingerprint, book)
+    except IdempotencyKeyReused:
+        abort(422)
+
+
+def admitted(book):
+    """Run ``book`` once the admission queue lets it through, 503 if the wait is too long."""
+    if ADMISSION is not None and not ADMISSION.admit():
+        abort(Response('Too many bookings at once, please try again in a moment.', 503,
+                       {'Retry-After': str(max(1, round(ADMISSION.max_wait)))}))
+    return book()
+
+
 @app.route('/purchase-places',methods=['POST'])
 def purchase_places():
-    competition = [c for c in COMPETITIONS if c['name'] == request.form['competition']][0]
-    club = [c for c in CLUBS if c['name'] == request.form['club']][0]
-    today = datetime.now()
-    comp_date = datetime.strptime(competition["date"], '%Y-%m-%d %H:%M:%S')
+    club = STORAGE.get_club(request.form['club'])
+    competition = STORAGE.get_competition(request.form['competition'])
+    if not club:
+        return render_template('index.html')
+    if not competition:
+        flash("Something went wrong-please try again")
+        return render_summary(club)
     places_required = int(request.form['places'])
-    club_points = int(club["points"])
-    competition_places = int(competition['number_of_places'])
-    if today < comp_date:
-        if club_points >= places_required:
-            if places_required <= 12:
-                if int(places_required) <= competition_places:            
-                    competition['number_of_places'] = competition_places - places_required
-                    club["points"] = club_points - places_required
-                    flash('Great-booking complete !')
-                else:
-                    flash("Sorry, you can't take more places that are available.")
-            else:
-                flash("Sorry, you can't take more than 12 places.")
-        else:
-            flash("Sorry, you can't take more places than you have points.")
-    else: 
-        flash(f"The competition has already taken place on this date : {comp_date}.")
-    return render_template('welcome.html', clubs=CLUBS, club=club, competitions=COMPETITIONS)
+    outcome = book_once(('purchase', club.name, competition.name, places_required),
+                        lambda: admitted(lambda: STORAGE.book(club, competition, places_required)))
+    flash(BOOKING_MESSAGES[outcome].format(date=competition.date))
+    if outcome == booking.NOT_ENOUGH_PLACES and WAITLIST is not None:
+        position = WAITLIST.join(club.name, competition.name, places_required)
+        flash(WAITLIST_FULL_MESSAGE if position is None else WAITLIST_MESSAGE.format(position=position))
+    return render_summary(club)
+
+@app.route('/purchase-places/batch',methods=['POST'])
+def purchase_places_batch():
+    club = STORAGE.get_club(request.form['club'])
+    if not club:
+        return render_template('index.html')
+    names = request.form.getlist('competition')
+    places = request.form.getlist('places', type=int)
+    competitions = [STORAGE.get_competition(name) for name in names]
+    if not names or len(places) != len(names) or any(comp is None for comp in competitions):
+        flash("Something went wrong-please try again")
+        return render_summary(club)
+    outcome, refused = book_once(('batch', club.name, tuple(names), tuple(places)),
+                                 lambda: admitted(lambda: STORAGE.book_many(club, list(zip(competitions, places)))))
+    if refused is None:
+        flash(BOOKING_MESSAGES[outcome])
+    else:
+        flash(f"{refused.name}: " + BOOKING_MESSAGES[outcome].format(date=refused.date))
+    return render_summary(club)
+
+
+@app.route('/points-board')
+def points_board():
+    cursor = request.args.get('cursor', type=int)
+    if cursor is not None and cursor < 0:
+        abort(400)
+    limit = request.args.get('limit', POINTS_BOARD_PAGE_SIZE, type=int)
+    limit = min(max(limit, 1), POINTS_BOARD_MAX_PAGE_SIZE)
+    clubs, next_cursor = STORAGE.clubs_page(cursor, limit)
+    return render_template('points_board.html', clubs=clubs, next_cursor=next_cursor, limit=limit)
+
+
+def iter_clubs():
+    cursor = None
+    while True:
+        clubs, cursor = STORAGE.clubs_page(cursor, EXPORT_BATCH_SIZE)
+        yield from clubs
+        if cursor is None:
+            return
+
+
+def stream_template(template_name, **context):
+    app.update_template_context(context)
+    return app.jinja_env.get_template(template_name).generate(context)
+
+
+@app.route('/points-board/export')
+def export_points_board():
+    # streamed page by page: memory stays flat whatever the number of clubs
+    return Response(stream_with_context(stream_template('points_board_export.html', clubs=iter_clubs())))
+
+
+def json_with_etag(name, build):
+    """JSON response tagged with the data version, 304 if the client has it."""
+    version = STORAGE.version()
+    etag = f'{name}-{version}'
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        body = FRAGMENTS.get(f'api-{name}', version, lambda: json.dumps(build()))
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+
+def competition_json(comp):
+    return {'name': comp.name, 'date': comp.date.strftime(DATE_FORMAT), 'number_of_places': comp.number_of_places}
+
+
+@app.route('/api/competitions')
+def api_competitions():
+    return json_with_etag('competitions', lambda: {'competitions': [
+        competition_json(comp) for comp in STORAGE.competitions()
+    ]})
+
+
+def date_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        abort(400)
+
+
+@app.route('/api/competitions/search')
+def search_competitions():
+    """Competitions by date order, filtered by ``upcoming=1``, ``from`` and ``to``
+    dates (``to`` excluded), name ``prefix`` and ``has_places=1``."""
+    index = COMPETITION_INDEX.get(STORAGE.competitions())
+    matches = index.query(after=datetime.now() if request.args.get('upcoming') == '1' else None,
+                          start=date_arg('from'), end=date_arg('to'), prefix=request.args.get('prefix'),
+                          has_places=request.args.get('has_places') == '1')
+    return {'competitions': [competition_json(comp) for comp in matches]}
+
+
+@app.route('/api/clubs')
+def api_clubs():
+    return json_with_etag('clubs', lambda: {'clubs': [
+        {'name': club.name, 'points': club.points}
+        for club in STORAGE.clubs()
+    ]})
+
+
+def booking_json(entry):
+    return {'competition': entry.competition, 'places': entry.places,
+            'booked_at': entry.booked_at and entry.booked_at.strftime(DATE_FORMAT)}
+
+
+@app.route('/api/clubs/<club_name>/bookings')
+def club_bookings(club_name):
+    if STORAGE.get_club(club_name) is None:
+        abort(404)
+    try:
+        history = STORAGE.history(club_name)
+        totals = STORAGE.club_totals(club_name)
+    except NotImplementedError:
+        abort(501)
+    return {'club': club_name, 'totals': totals, 'bookings': [booking_json(entry) for entry in history]}
+
+
+@app.route('/api/competitions/<competition_name>/bookings')
+def competition_bookings(competition_name):
+    if STORAGE.get_competition(competition_name) is None:
+        abort(404)
+    try:
+        totals = STORAGE.competition_totals(competition_name)
+    except NotImplementedError:
+        abort(501)
+    return {'competition': competition_name, 'totals': totals}
+
 
 @app.route('/logout')
 def logout():
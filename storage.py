@@ -0,0 +1,663 @@
+import atexit
+import itertools
+import multiprocessing
+import os
+import sqlite3
+import threading
+import uuid
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+from multiprocessing import shared_memory
+
+import booking
+from booking import BookingEngine
+from models import DATE_FORMAT, Booking, Club, Competition
+
+STRIPES = 64
+# (club, competition) pairs the shared storage can count booked places for
+BOOKED_PAIRS = 1 << 20
+# Fibonacci hashing spreads the packed pair keys over the table
+PAIR_HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+
+
+class Storage:
+    """Data access the routes depend on.
+
+    Clubs and competitions are ``models.Club`` and ``models.Competition``
+    records.
+    """
+
+    def clubs(self):
+        raise NotImplementedError
+
+    def competitions(self):
+        raise NotImplementedError
+
+    def version(self):
+        """Value that changes whenever a booking changes points or places."""
+        raise NotImplementedError
+
+    def clubs_page(self, cursor, limit):
+        """Return up to ``limit`` clubs after ``cursor`` and the next cursor.
+
+        ``cursor`` is ``None`` for the first page; the next cursor is ``None``
+        after the last one.
+        """
+        raise NotImplementedError
+
+    def get_club(self, name):
+        raise NotImplementedError
+
+    def get_club_by_email(self, email):
+        raise NotImplementedError
+
+    def get_competition(self, name):
+        raise NotImplementedError
+
+    def book(self, club, competition, places_required, now=None):
+        """Book places and return the ``booking`` outcome.
+
+        On success the given club and competition reflect the new counts.
+        """
+        raise NotImplementedError
+
+    def book_many(self, club, items, now=None):
+        """Book all ``(competition, places)`` items or none of them.
+
+        Returns the outcome and the competition refused, if any.
+        """
+        raise NotImplementedError
+
+    def history(self, club_name):
+        """``models.Booking`` records of the club, oldest first."""
+        raise NotImplementedError
+
+    def club_totals(self, club_name):
+        """Bookings, places and distinct competitions booked by the club."""
+        raise NotImplementedError
+
+    def competition_totals(self, competition_name):
+        """Bookings, places and distinct clubs booked in the competition."""
+        raise NotImplementedError
+
+
+class SharedExclusiveLock:
+    """Lock held shared by many threads at once, or exclusively by one.
+
+    Threads waiting for the exclusive side go first, so a steady flow of
+    shared holders cannot starve them.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._shared = 0
+        self._exclusive = False
+        self._waiting = 0
+
+    @contextmanager
+    def shared(self):
+        with self._condition:
+            self._condition.wait_for(lambda: not self._exclusive and not self._waiting)
+            self._shared += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._shared -= 1
+                if not self._shared:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        with self._condition:
+            self._waiting += 1
+            self._condition.wait_for(lambda: not self._exclusive and not self._shared)
+            self._waiting -= 1
+            self._exclusive = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._exclusive = False
+                self._condition.notify_all()
+
+
+class JsonStorage(Storage):
+    """Clubs and competitions loaded from the JSON files, held in memory.
+
+    Both registries live in a single snapshot that ``reload`` replaces in
+    one assignment, so a lookup sees either the old data or the new, never
+    a mix. Bookings hold the reload lock shared and resolve their records by
+    name in the current snapshot, so none is lost to a concurrent reload.
+    """
+
+    def __init__(self, clubs, competitions, engine=None):
+        self._data = (clubs, competitions)
+        self.engine = engine or BookingEngine()
+        self._reload_lock = SharedExclusiveLock()
+        # next() on a count is atomic, so concurrent bookings get distinct versions;
+        # the instance prefix tells apart the in-memory copies of separate workers
+        self._instance = uuid.uuid4().hex[:12]
+        self._versions = itertools.count(1)
+        self._version = f'{self._instance}-0'
+
+    def clubs(self):
+        return self._data[0]
+
+    def competitions(self):
+        return self._data[1]
+
+    def version(self):
+        return self._version
+
+    def clubs_page(self, cursor, limit):
+        clubs = self._data[0]
+        start = cursor or 0
+        end = start + limit
+        return clubs[start:end], end if end < len(clubs) else None
+
+    def get_club(self, name):
+        return self._data[0].get('name', name)
+
+    def get_club_by_email(self, email):
+        return self._data[0].get('email', email)
+
+    def get_competition(self, name):
+        return self._data[1].get('name', name)
+
+    def book(self, club, competition, places_required, now=None):
+        with self._reload_lock.shared():
+            clubs, competitions = self._data
+            current_club = current_record(clubs, club)
+            current_competition = current_record(competitions, competition)
+            outcome = self.engine.book(current_club, current_competition, places_required, now=now)
+        if outcome == booking.BOOKED:
+            self._bump_version()
+        club.points = current_club.points
+        competition.number_of_places = current_competition.number_of_places
+        return outcome
+
+    def book_many(self, club, items, now=None):
+        with self._reload_lock.shared():
+            clubs, competitions = self._data
+            current_club = current_record(clubs, club)
+            current_items = [(current_record(competitions, competition), places) for competition, places in items]
+            outcome, refused = self.engine.book_many(current_club, current_items, now=now)
+        if outcome == booking.BOOKED:
+            self._bump_version()
+        club.points = current_club.points
+        for (competition, _), (current_competition, _) in zip(items, current_items):
+            competition.number_of_places = current_competition.number_of_places
+        if refused is not None:
+            refused = next(competition for (competition, _), (current, _) in zip(items, current_items)
+                           if current is refused)
+        return outcome, refused
+
+    def history(self, club_name):
+        return self.engine.ledger.history(club_name)
+
+    def club_totals(self, club_name):
+        return self.engine.ledger.club_totals(club_name)
+
+    def competition_totals(self, competition_name):
+        return self.engine.ledger.competition_totals(competition_name)
+
+    def reload(self, clubs, competitions, replay=None):
+        """Swap in freshly loaded registries, keeping the bookings made since.
+
+        The registries are parsed by the caller, outside any lock. Bookings
+        are paused only while they catch up: ``replay(clubs, competitions)``
+        applies them when given (e.g. from the journal), otherwise the
+        points and places the engine has taken since startup are.
+        """
+        with self._reload_lock.exclusive():
+            if replay is not None:
+                replay(clubs, competitions)
+            else:
+                for (kind, name), places in self.engine.taken.items():
+                    registry, field = (clubs, 'points') if kind == 'club' else (competitions, 'number_of_places')
+                    record = registry.get('name', name)
+                    if record is not None:
+                        record[field] -= places
+            self._data = (clubs, competitions)
+            self._bump_version()
+
+    def _bump_version(self):
+        self._version = f'{self._instance}-{next(self._versions)}'
+
+
+def pair_key(club_slot, competition_slot):
+    # slots start at 1, so no key is 0, which marks a free entry
+    return club_slot << 32 | competition_slot
+
+
+def current_record(registry, record):
+    """The registry's record named like ``record``, which may predate a reload."""
+    current = registry.get('name', record.name)
+    return record if current is None else current
+
+
+class SharedMemoryStorage(Storage):
+    """Clubs and competitions whose points and places live in shared memory.
+
+    Created before the server forks its workers (``gunicorn --preload``),
+    it gives every worker its own copy of the records but a single array of
+    64-bit counters, one per club and competition, in a
+    ``multiprocessing.shared_memory`` block. Records are refreshed from the
+    counters when they are read. A booking locks the stripes holding its
+    counters, checks them and decrements them (compare-and-decrement), so
+    no two workers can sell the same place or spend the same points.
+
+    The places each club booked in each competition, which the places
+    limit counts, are kept after the counters in a hash table of
+    ``booked_pairs`` (club, competition) entries, filled as clubs book. Once
+    it is full, bookings for new pairs are refused with ``LEDGER_FULL``.
+    """
+
+    def __init__(self, clubs, competitions, stripes=STRIPES, booked_pairs=BOOKED_PAIRS):
+        self._clubs = clubs
+        self._competitions = competitions
+        # slot 0 holds the version, then one slot per club and per competition
+        self._slots = {id(record): slot for slot, record in enumerate(itertools.chain(clubs, competitions), 1)}
+        # then the booked places table: (pair key, places) entries, key 0 for a free entry
+        self._table = 1 + len(self._slots)
+        self._booked_pairs = booked_pairs
+        self._memory = shared_memory.SharedMemory(create=True, size=8 * (self._table + 2 * booked_pairs))
+        self._counters = self._memory.buf.cast('q')
+        self._counters[0] = 0
+        for club in clubs:
+            self._counters[self._slots[id(club)]] = club.points
+        for competition in competitions:
+            self._counters[self._slots[id(competition)]] = competition.number_of_places
+        self._stripes = [multiprocessing.Lock() for _ in range(stripes)]
+        self._version_lock = multiprocessing.Lock()
+        self._table_lock = multiprocessing.Lock()
+        self._refreshed = {}
+        self._owner = os.getpid()
+        atexit.register(self.close)
+
+    def close(self):
+        if self._memory is None:
+            return
+        self._counters.release()
+        self._memory.close()
+        # forked workers share the block, only the process that created it removes it
+        if os.getpid() == self._owner:
+            self._memory.unlink()
+        self._memory = None
+
+    def clubs(self):
+        return self._refreshed_list(self._clubs)
+
+    def competitions(self):
+        return self._refreshed_list(self._competitions)
+
+    def version(self):
+        return self._counters[0]
+
+    def clubs_page(self, cursor, limit):
+        start = cursor or 0
+        end = start + limit
+        page = self._clubs[start:end]
+        for club in page:
+            self._refresh(club)
+        return page, end if end < len(self._clubs) else None
+
+    def get_club(self, name):
+        return self._refresh(self._clubs.get('name', name))
+
+    def get_club_by_email(self, email):
+        return self._refresh(self._clubs.get('email', email))
+
+    def get_competition(self, name):
+        return self._refresh(self._competitions.get('name', name))
+
+    def book(self, club, competition, places_required, now=None):
+        now = now or datetime.now()
+        club_slot = self._slot(self._clubs, club)
+        competition_slot = self._slot(self._competitions, competition)
+        with self._locked(club_slot, competition_slot):
+            club.points = self._counters[club_slot]
+            competition.number_of_places = self._counters[competition_slot]
+            key = pair_key(club_slot, competition_slot)
+            entry = self._find_pair(key)
+            booked = 0 if entry is None else self._counters[entry + 1]
+            outcome = booking.check(club, competition, places_required, now, booked=booked)
+            if outcome == booking.BOOKED and entry is None:
+                # added first: a full table must refuse before anything is counted
+                entry = self._add_pair(key)
+                if entry is None:
+                    outcome = booking.LEDGER_FULL
+            if outcome == booking.BOOKED:
+                self._counters[competition_slot] -= places_required
+                self._counters[club_slot] -= places_required
+                self._counters[entry + 1] += places_required
+                competition.number_of_places -= places_required
+                club.points -= places_required
+        if outcome == booking.BOOKED:
+            self._bump_version()
+        return outcome
+
+    def book_many(self, club, items, now=None):
+        now = now or datetime.now()
+        requested = booking.merge_items(items)
+        club_slot = self._slot(self._clubs, club)
+        slots = [self._slot(self._competitions, competition) for competition, _ in requested]
+        with self._locked(club_slot, *slots):
+            club.points = self._counters[club_slot]
+            for (competition, _), slot in zip(requested, slots):
+                competition.number_of_places = self._counters[slot]
+            keys = [pair_key(club_slot, slot) for slot in slots]
+            entries = [self._find_pair(key) for key in keys]
+            booked = {competition.name: 0 if entry is None else self._counters[entry + 1]
+                      for (competition, _), entry in zip(requested, entries)}
+            outcome, refused = booking.check_many(club, requested, now, booked=booked)
+            if outcome == booking.BOOKED:
+                for position, (key, entry) in enumerate(zip(keys, entries)):
+                    if entry is None:
+                        entries[position] = entry = self._add_pair(key)
+                    if entry is None:
+                        outcome, refused = booking.LEDGER_FULL, requested[position][0]
+                        break
+            if outcome == booking.BOOKED:
+                for (competition, places), slot, entry in zip(requested, slots, entries):
+                    self._counters[slot] -= places
+                    self._counters[club_slot] -= places
+                    self._counters[entry + 1] += places
+                    competition.number_of_places -= places
+                    club.points -= places
+        if outcome == booking.BOOKED:
+            self._bump_version()
+        for competition, _ in items:
+            self._refresh(competition)
+        return outcome, refused
+
+    def _slot(self, registry, record):
+        slot = self._slots.get(id(record))
+        if slot is None:
+            # a copy of a record, e.g. from another storage: use the registered one
+            slot = self._slots[id(registry.get('name', record.name))]
+        return slot
+
+    def _probe(self, key):
+        """Table entries on the linear probing path of ``key``."""
+        index = key * PAIR_HASH_MULTIPLIER % 2 ** 64 % self._booked_pairs
+        for _ in range(self._booked_pairs):
+            yield self._table + 2 * index
+            index = (index + 1) % self._booked_pairs
+
+    def _find_pair(self, key):
+        """Entry of the pair ``key`` in the table, None if it never booked.
+
+        Read without the table lock, holding the pair's stripes: a pair is
+        only added by a booking holding them, and entries are never removed,
+        so every entry on the path to the pair's stays taken.
+        """
+        for entry in self._probe(key):
+            current = self._counters[entry]
+            if current == key:
+                return entry
+            if current == 0:
+                return None
+        return None
+
+    def _add_pair(self, key):
+        """Take the first free entry on the path of ``key``; None if the table is full."""
+        with self._table_lock:
+            for entry in self._probe(key):
+                if self._counters[entry] == 0:
+                    self._counters[entry] = key
+                    return entry
+        return None
+
+    @contextmanager
+    def _locked(self, *slots):
+        # stripes in index order, each once, so bookings cannot deadlock
+        with ExitStack() as locks:
+            for stripe in sorted({slot % len(self._stripes) for slot in slots}):
+                locks.enter_context(self._stripes[stripe])
+            yield
+
+    def _bump_version(self):
+        # after the counters, so a list cached under the new version has every booking
+        with self._version_lock:
+            self._counters[0] += 1
+
+    def _refresh(self, record):
+        if record is None:
+            return None
+        field = 'points' if isinstance(record, Club) else 'number_of_places'
+        record[field] = self._counters[self._slots[id(record)]]
+        return record
+
+    def _refreshed_list(self, registry):
+        # read the version first: records refreshed under it can only be newer
+        version = self.version()
+        if self._refreshed.get(id(registry)) != version:
+            for record in registry:
+                self._refresh(record)
+            self._refreshed[id(registry)] = version
+        return registry
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS clubs (
+    name TEXT PRIMARY KEY,
+    email TEXT NOT NULL,
+    points INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS clubs_email ON clubs (email);
+CREATE TABLE IF NOT EXISTS competitions (
+    name TEXT PRIMARY KEY,
+    date TEXT NOT NULL,
+    number_of_places INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0);
+CREATE TABLE IF NOT EXISTS bookings (
+    club TEXT NOT NULL,
+    competition TEXT NOT NULL,
+    places INTEGER NOT NULL,
+    booked_at TEXT
+);
+CREATE INDEX IF NOT EXISTS bookings_club ON bookings (club, competition);
+CREATE INDEX IF NOT EXISTS bookings_competition ON bookings (competition, club);
+"""
+
+
+class SqliteStorage(Storage):
+    """Clubs and competitions in a SQLite database shared by every worker.
+
+    The database runs in WAL mode so readers never block the booking
+    writer, and each booking is a single ``BEGIN IMMEDIATE`` transaction
+    whose updates only apply while enough points and places remain. It also
+    bumps a version row, which lets every worker reuse its club and
+    competition lists until another booking lands.
+    """
+
+    def __init__(self, path, timeout=30):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lists = {}
+        connection = self._connection()
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.executescript(SCHEMA)
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def is_empty(self):
+        return self._connection().execute('SELECT NOT EXISTS (SELECT 1 FROM clubs)').fetchone()[0]
+
+    def import_records(self, clubs, competitions):
+        """Add the clubs and competitions the database does not hold yet.
+
+        Records already there keep their points and places: workers starting
+        at once may all find the database empty and import it, after another
+        one started booking.
+        """
+        connection = self._connection()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.executemany(
+                'INSERT OR IGNORE INTO clubs (name, email, points) VALUES (?, ?, ?)',
+                ((c.name, c.email, c.points) for c in clubs))
+            connection.executemany(
+                'INSERT OR IGNORE INTO competitions (name, date, number_of_places) VALUES (?, ?, ?)',
+                ((c.name, c.date.strftime(DATE_FORMAT), c.number_of_places) for c in competitions))
+            self._bump_version(connection)
+
+    def clubs(self):
+        return self._cached_list('SELECT name, email, points FROM clubs ORDER BY rowid', club_from_row)
+
+    def competitions(self):
+        return self._cached_list('SELECT name, date, number_of_places FROM competitions ORDER BY rowid',
+                                 competition_from_row)
+
+    def version(self):
+        return self._connection().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+    def clubs_page(self, cursor, limit):
+        rows = self._connection().execute(
+            'SELECT rowid, name, email, points FROM clubs WHERE rowid > ? ORDER BY rowid LIMIT ?',
+            (cursor or 0, limit + 1)).fetchall()
+        page = [club_from_row(row) for row in rows[:limit]]
+        return page, rows[limit - 1]['rowid'] if len(rows) > limit else None
+
+    def get_club(self, name):
+        return self._select_one('SELECT name, email, points FROM clubs WHERE name = ?', club_from_row, name)
+
+    def get_club_by_email(self, email):
+        return self._select_one('SELECT name, email, points FROM clubs WHERE email = ? ORDER BY rowid',
+                                club_from_row, email)
+
+    def get_competition(self, name):
+        return self._select_one('SELECT name, date, number_of_places FROM competitions WHERE name = ?',
+                                competition_from_row, name)
+
+    def book(self, club, competition, places_required, now=None):
+        now = now or datetime.now()
+        connection = self._connection()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            current_club = self.get_club(club.name)
+            current_competition = self.get_competition(competition.name)
+            booked = self._booked(connection, club.name, competition.name)
+            outcome = booking.check(current_club, current_competition, places_required, now, booked=booked)
+            if outcome != booking.BOOKED:
+                return outcome
+            updated = connection.execute(
+                'UPDATE competitions SET number_of_places = number_of_places - ? '
+                'WHERE name = ? AND number_of_places >= ?',
+                (places_required, competition.name, places_required)).rowcount
+            if not updated:
+                return booking.NOT_ENOUGH_PLACES
+            updated = connection.execute(
+                'UPDATE clubs SET points = points - ? WHERE name = ? AND points >= ?',
+                (places_required, club.name, places_required)).rowcount
+            if not updated:
+                connection.execute('ROLLBACK')
+                return booking.NOT_ENOUGH_POINTS
+            self._record_booking(connection, club.name, competition.name, places_required, now)
+            self._bump_version(connection)
+        competition.number_of_places = current_competition.number_of_places - places_required
+        club.points = current_club.points - places_required
+        return outcome
+
+    def book_many(self, club, items, now=None):
+        now = now or datetime.now()
+        connection = self._connection()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            current_club = self.get_club(club.name)
+            requested = booking.merge_items(
+                (self.get_competition(competition.name), places) for competition, places in items)
+            booked = {competition.name: self._booked(connection, club.name, competition.name)
+                      for competition, _ in requested}
+            outcome, refused = booking.check_many(current_club, requested, now, booked=booked)
+            if outcome != booking.BOOKED:
+                return outcome, refused
+            for competition, places in requested:
+                updated = connection.execute(
+                    'UPDATE competitions SET number_of_places = number_of_places - ? '
+                    'WHERE name = ? AND number_of_places >= ?',
+                    (places, competition.name, places)).rowcount
+                if not updated:
+                    connection.execute('ROLLBACK')
+                    return booking.NOT_ENOUGH_PLACES, competition
+            points_required = sum(places for _, places in requested)
+            updated = connection.execute(
+                'UPDATE clubs SET points = points - ? WHERE name = ? AND points >= ?',
+                (points_required, club.name, points_required)).rowcount
+            if not updated:
+                connection.execute('ROLLBACK')
+                return booking.NOT_ENOUGH_POINTS, None
+            for competition, places in requested:
+                self._record_booking(connection, club.name, competition.name, places, now)
+            self._bump_version(connection)
+        remaining = {competition.name: competition.number_of_places - places for competition, places in requested}
+        for competition, _ in items:
+            competition.number_of_places = remaining[competition.name]
+        club.points = current_club.points - points_required
+        return outcome, None
+
+    def history(self, club_name):
+        rows = self._connection().execute(
+            'SELECT club, competition, places, booked_at FROM bookings WHERE club = ? ORDER BY rowid', (club_name,))
+        return [Booking.from_dict(dict(row)) for row in rows]
+
+    def club_totals(self, club_name):
+        row = self._connection().execute(
+            'SELECT COUNT(*), COALESCE(SUM(places), 0), COUNT(DISTINCT competition) FROM bookings WHERE club = ?',
+            (club_name,)).fetchone()
+        return {'bookings': row[0], 'places': row[1], 'competitions': row[2]}
+
+    def competition_totals(self, competition_name):
+        row = self._connection().execute(
+            'SELECT COUNT(*), COALESCE(SUM(places), 0), COUNT(DISTINCT club) FROM bookings WHERE competition = ?',
+            (competition_name,)).fetchone()
+        return {'bookings': row[0], 'places': row[1], 'clubs': row[2]}
+
+    def _booked(self, connection, club_name, competition_name):
+        return connection.execute(
+            'SELECT COALESCE(SUM(places), 0) FROM bookings WHERE club = ? AND competition = ?',
+            (club_name, competition_name)).fetchone()[0]
+
+    def _record_booking(self, connection, club_name, competition_name, places, now):
+        connection.execute('INSERT INTO bookings (club, competition, places, booked_at) VALUES (?, ?, ?, ?)',
+                           (club_name, competition_name, places, now.strftime(DATE_FORMAT)))
+
+    def _bump_version(self, connection):
+        connection.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+
+    def _cached_list(self, query, from_row):
+        # read the version first: a list cached under it can only be newer
+        version = self.version()
+        cached = self._lists.get(query)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        records = [from_row(row) for row in self._connection().execute(query)]
+        self._lists[query] = (version, records)
+        return records
+
+    def _select_one(self, query, from_row, *params):
+        row = self._connection().execute(query, params).fetchone()
+        return from_row(row) if row else None
+
+
+def club_from_row(row):
+    return Club(row['name'], row['email'], row['points'])
+
+
+def competition_from_row(row):
+    return Competition(row['name'], datetime.strptime(row['date'], DATE_FORMAT), row['number_of_places'])
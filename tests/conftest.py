@@ -0,0 +1,6 @@
+import os
+import sys
+
+# server.py imports its sibling modules as top-level modules, as the tests do:
+# make them importable however pytest is started
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
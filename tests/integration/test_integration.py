@@ -2,6 +2,7 @@ from ... import server
 from ...server import app
 from flask import template_rendered
 from contextlib import contextmanager
+from storage import JsonStorage
 from ..mock import CLUBS, COMPETITIONS
 
 
@@ -20,8 +21,7 @@ def test_login_and_logout(mocker):
     '''test that connexion work and doesn't change points'''
     with captured_templates(app) as templates:
         
-        mocker.patch.object(server, 'CLUBS', CLUBS)
-        mocker.patch.object(server, 'COMPETITIONS', COMPETITIONS)
+        mocker.patch.object(server, 'STORAGE', JsonStorage(CLUBS, COMPETITIONS))
         credentials = {'email':'huge@shirts.com'}
         
         club = CLUBS[0]
@@ -46,8 +46,7 @@ def test_login_and_booking(mocker):
     '''test login and booking'''
     with captured_templates(app) as templates:
         
-        mocker.patch.object(server, 'CLUBS', CLUBS)
-        mocker.patch.object(server, 'COMPETITIONS', COMPETITIONS)
+        mocker.patch.object(server, 'STORAGE', JsonStorage(CLUBS, COMPETITIONS))
         credentials = {'email':'huge@shirts.com'}
         
         response = app.test_client().post('/show-summary', data = credentials) 
@@ -67,8 +66,7 @@ def test_booking_and_purchase_places(mocker):
     '''test booking and purchase places'''
     with captured_templates(app) as templates:
         
-        mocker.patch.object(server, 'CLUBS', CLUBS) 
-        mocker.patch.object(server, 'COMPETITIONS', COMPETITIONS)
+        mocker.patch.object(server, 'STORAGE', JsonStorage(CLUBS, COMPETITIONS))
    
         club = CLUBS[0]
         club_name = club['name']
@@ -1,4 +1,7 @@
-CLUBS = [
+from models import Club, Competition
+from registry import Registry
+
+CLUBS = Registry(map(Club.from_dict, [
     {
         "name":"Huge shirts",
         "email":"huge@shirts.com",
@@ -14,9 +17,9 @@ CLUBS = [
         "email":"cool@buddies.uk",
         "points":"12"
     }
-]
+]), keys=('name', 'email'))
 
-COMPETITIONS = [
+COMPETITIONS = Registry(map(Competition.from_dict, [
         {
             "name": "Magic festival",
             "date": "2020-03-27 10:00:00",
@@ -32,4 +35,4 @@ COMPETITIONS = [
             "date": "2022-10-22 13:30:00",
             "number_of_places": "20"
         }
-    ]
\ No newline at end of file
+    ]), keys=('name',))
@@ -0,0 +1,94 @@
+"""Purchase throughput under many concurrent connections, threads vs. gevent.
+
+Starts the app on a generated dataset with ``flask run --with-threads``,
+then with ``async_server.py``, and keeps ``connections`` clients posting
+``/purchase-places`` for ``seconds`` each, one request per connection
+like a burst of clubs opening the page at once. Reports requests/s, p50
+and p99 latency and failed requests for both.
+
+Run from the project root:
+
+    python -m tests.performance.bench_async [connections] [seconds]
+"""
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import urllib.parse
+
+from tests.performance.generate_dataset import club_name, competition_name, generate
+from tests.performance.run_load_test import ROOT_DIR, start_server
+
+CLUBS = 1_000
+COMPETITIONS = 100
+PORT = 5077
+
+
+async def purchase(port, rng):
+    body = urllib.parse.urlencode({
+        'club': club_name(rng.randrange(CLUBS)),
+        'competition': competition_name(rng.randrange(COMPETITIONS)),
+        'places': rng.randint(1, 3),
+    }).encode()
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        writer.write(b'POST /purchase-places HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n'
+                     b'Content-Type: application/x-www-form-urlencoded\r\n'
+                     b'Content-Length: %d\r\n\r\n%s' % (len(body), body))
+        await writer.drain()
+        status = await reader.readline()
+        await reader.read()
+        return status.split()[1] == b'200'
+    finally:
+        writer.close()
+
+
+async def client(port, deadline, latencies, failures, seed):
+    rng = random.Random(seed)
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            ok = await purchase(port, rng)
+        except (OSError, IndexError):
+            ok = False
+        if ok:
+            latencies.append(time.perf_counter() - start)
+        else:
+            failures.append(1)
+
+
+async def load(port, connections, seconds):
+    latencies, failures = [], []
+    deadline = time.monotonic() + seconds
+    await asyncio.gather(*(client(port, deadline, latencies, failures, seed) for seed in range(connections)))
+    return latencies, failures
+
+
+def main(connections=200, seconds=10):
+    variants = [
+        ('threads', None),
+        ('gevent', [sys.executable, os.path.join(ROOT_DIR, 'async_server.py'), '--port', str(PORT)]),
+    ]
+    with tempfile.TemporaryDirectory() as dataset_dir:
+        generate(dataset_dir, CLUBS, COMPETITIONS)
+        print(f"{connections} connections, {seconds}s per server")
+        print(f"{'server':>8} {'req/s':>8} {'p50 (ms)':>9} {'p99 (ms)':>9} {'failed':>7}")
+        for label, command in variants:
+            server, _ = start_server(dataset_dir, PORT, command)
+            try:
+                latencies, failures = asyncio.run(load(PORT, connections, seconds))
+            finally:
+                server.terminate()
+                server.wait()
+            latencies.sort()
+            p50 = statistics.median(latencies) if latencies else 0
+            p99 = latencies[int(len(latencies) * 0.99)] if latencies else 0
+            print(f"{label:>8} {len(latencies) / seconds:>8.0f} {p50 * 1000:>9.1f} {p99 * 1000:>9.1f} "
+                  f"{len(failures):>7}")
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
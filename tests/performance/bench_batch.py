@@ -0,0 +1,48 @@
+"""N single purchases against one batch purchase of the same N items.
+
+Run from the project root:
+
+    python -m tests.performance.bench_batch [items] [clubs]
+"""
+import sys
+import time
+from datetime import datetime
+
+import server
+from models import Club, Competition
+from registry import Registry
+from storage import JsonStorage
+
+COMPETITION_DATE = datetime(2099, 10, 22, 13, 30)
+
+
+def reset_storage(items, clubs):
+    server.STORAGE = JsonStorage(
+        Registry((Club(f"Club {i}", f"secretary@club{i}.com", 1_000_000) for i in range(clubs)),
+                 keys=('name', 'email')),
+        Registry(Competition(f"Competition {i}", COMPETITION_DATE, 1_000) for i in range(items)),
+    )
+
+
+def main(items=10, clubs=1_000):
+    client = server.app.test_client()
+    names = [f"Competition {i}" for i in range(items)]
+
+    reset_storage(items, clubs)
+    start = time.perf_counter()
+    for name in names:
+        client.post('/purchase-places', data={"club": "Club 0", "competition": name, "places": 1})
+    singles = time.perf_counter() - start
+
+    reset_storage(items, clubs)
+    start = time.perf_counter()
+    client.post('/purchase-places/batch', data={"club": "Club 0", "competition": names, "places": [1] * items})
+    batch = time.perf_counter() - start
+
+    print(f"{items} competitions, {clubs} clubs")
+    print(f"  {items} single purchases: {singles * 1000:8.1f} ms")
+    print(f"  1 batch purchase:    {batch * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,75 @@
+"""Time from a cold ``import server`` to its first rendered summary page.
+
+Each run starts a fresh interpreter, imports the app, then logs a club in
+through the test client, which renders the welcome page and its listings
+for the first time. Runs are repeated and the median is reported, with
+templates compiled on first use and with templates precompiled by
+``flask compile-templates``. Given a number of clubs, the app is started
+on a generated dataset of that size, also with ``GUDLFT_LAZY_LOAD``.
+
+Run from the project root:
+
+    python -m tests.performance.bench_cold_start [clubs] [runs]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from tests.performance.generate_dataset import club_email, generate
+
+
+def measure(email):
+    start = time.perf_counter()
+    import server
+    imported = time.perf_counter()
+    response = server.app.test_client().post('/show-summary', data={'email': email})
+    assert response.status_code == 200
+    print(json.dumps({'import': imported - start, 'first_response': time.perf_counter() - start}))
+
+
+def run(env, email, runs):
+    results = [json.loads(subprocess.run(
+        [sys.executable, '-m', 'tests.performance.bench_cold_start', '--measure', email],
+        env=env, check=True, capture_output=True, text=True).stdout) for _ in range(runs)]
+    return (statistics.median(result['import'] for result in results),
+            statistics.median(result['first_response'] for result in results))
+
+
+def compile_templates(target):
+    from rendering import compile_templates
+    import server
+    compile_templates(server.app, target)
+
+
+def main(clubs=0, runs=5):
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ)
+        email = 'john@simplylift.co'
+        if clubs:
+            generate(directory, clubs, 100)
+            env.update(GUDLFT_CLUBS_PATH=os.path.join(directory, 'clubs.json'),
+                       GUDLFT_COMPETITIONS_PATH=os.path.join(directory, 'competitions.json'))
+            email = club_email(0)
+        cache = os.path.join(directory, 'templates')
+        subprocess.run([sys.executable, '-m', 'tests.performance.bench_cold_start', '--compile', cache],
+                       env=env, check=True)
+        variants = [('on first use', env), ('precompiled', dict(env, GUDLFT_TEMPLATE_CACHE=cache))]
+        if clubs:
+            variants.append(('precompiled, lazy', dict(env, GUDLFT_TEMPLATE_CACHE=cache, GUDLFT_LAZY_LOAD='1')))
+        print(f"{'templates':>18} {'import (ms)':>12} {'first response (ms)':>20}")
+        for label, variant_env in variants:
+            imported, first_response = run(variant_env, email, runs)
+            print(f"{label:>18} {imported * 1000:>12.1f} {first_response * 1000:>20.1f}")
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--measure']:
+        measure(sys.argv[2])
+    elif sys.argv[1:2] == ['--compile']:
+        compile_templates(sys.argv[2])
+    else:
+        main(*(int(arg) for arg in sys.argv[1:]))
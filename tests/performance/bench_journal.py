@@ -0,0 +1,58 @@
+"""Bookings per second with each journal durability mode.
+
+Run from the project root:
+
+    python -m tests.performance.bench_journal [bookings] [threads]
+"""
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import journal
+from booking import BookingEngine
+from journal import BookingJournal
+from models import Club, Competition
+
+NOW = datetime(2022, 1, 1)
+CLUBS = 200
+COMPETITIONS = 20
+
+
+def run(engine, bookings, threads):
+    clubs = [Club(f"Club {i}", f"secretary@club{i}.com", 1000000) for i in range(CLUBS)]
+    competitions = [
+        Competition(f"Competition {i}", datetime(2022, 10, 22, 13, 30), 1000000)
+        for i in range(COMPETITIONS)
+    ]
+
+    def book(i):
+        return engine.book(clubs[i % CLUBS], competitions[i % COMPETITIONS], 1, now=NOW)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(book, range(bookings)))
+    return bookings / (time.perf_counter() - start)
+
+
+def main(bookings=5_000, threads=32):
+    modes = [('in-memory only', None, None)]
+    modes += [(journal.ALWAYS, journal.ALWAYS, None)]
+    modes += [(f'{journal.BATCHED} {ms}ms', journal.BATCHED, ms) for ms in (1, 5, 20)]
+    with tempfile.TemporaryDirectory() as directory:
+        for label, durability, batch_ms in modes:
+            booking_journal = None
+            if durability:
+                path = os.path.join(directory, f'{label}.journal')
+                options = {'batch_ms': batch_ms} if batch_ms else {}
+                booking_journal = BookingJournal(path, durability=durability, **options)
+            rate = run(BookingEngine(journal=booking_journal), bookings, threads)
+            if booking_journal:
+                booking_journal.close()
+            print(f"{label:>16}: {rate:>10,.0f} bookings/s")
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
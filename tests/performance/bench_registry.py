@@ -0,0 +1,40 @@
+"""Club lookup latency, registry index vs. the former list scan.
+
+Run from the project root:
+
+    python -m tests.performance.bench_registry
+"""
+import timeit
+
+from registry import Registry
+
+SIZES = (3, 1_000, 10_000, 100_000)
+LOOKUPS = 1_000
+
+
+def generate_clubs(size):
+    return [
+        {"name": f"Club {i}", "email": f"secretary@club{i}.com", "points": "13"}
+        for i in range(size)
+    ]
+
+
+def scan(clubs, email):
+    return [club for club in clubs if club['email'] == email][0]
+
+
+def main():
+    print(f"{'clubs':>8} {'registry (us)':>14} {'scan (us)':>12}")
+    for size in SIZES:
+        clubs = generate_clubs(size)
+        registry = Registry(clubs, keys=('name', 'email'))
+        # worst case for the scan: the last club of the file
+        email = clubs[-1]['email']
+        indexed = timeit.timeit(lambda: registry.get('email', email), number=LOOKUPS)
+        scans = min(LOOKUPS, max(1, 1_000_000 // size))
+        scanned = timeit.timeit(lambda: scan(clubs, email), number=scans)
+        print(f"{size:>8} {indexed / LOOKUPS * 1e6:>14.3f} {scanned / scans * 1e6:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""Summary page render time with and without the fragment cache.
+
+Run from the project root:
+
+    python -m tests.performance.bench_render [clubs] [competitions]
+"""
+import sys
+import timeit
+from datetime import datetime
+
+import server
+from models import Club, Competition
+from registry import Registry
+from rendering import FragmentCache
+from storage import JsonStorage
+
+RENDERS = 20
+
+
+def generate_data(clubs, competitions):
+    return (
+        Registry((Club(f"Club {i}", f"secretary@club{i}.com", 13) for i in range(clubs)),
+                 keys=('name', 'email')),
+        Registry(Competition(f"Competition {i}", datetime(2099, 10, 22, 13, 30), 25)
+                 for i in range(competitions)),
+    )
+
+
+def main(clubs=10_000, competitions=1_000):
+    server.STORAGE = JsonStorage(*generate_data(clubs, competitions))
+    club = server.STORAGE.clubs()[0]
+
+    with server.app.test_request_context():
+        def uncached():
+            # a fresh cache is what every request paid before the cache
+            server.FRAGMENTS = FragmentCache()
+            server.render_summary(club)
+
+        def cached():
+            server.render_summary(club)
+
+        cached()
+        before = timeit.timeit(uncached, number=RENDERS) / RENDERS
+        after = timeit.timeit(cached, number=RENDERS) / RENDERS
+
+    print(f"{clubs} clubs / {competitions} competitions")
+    print(f"  full render:   {before * 1000:8.2f} ms")
+    print(f"  cached render: {after * 1000:8.2f} ms")
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,74 @@
+"""Startup time and peak memory loading clubs.json, json.load vs. streaming.
+
+Generates a clubs file (1M clubs by default), then loads it in a fresh
+process per strategy and reports the time until the clubs registry is
+complete, the time until the first club can be looked up, and the peak
+resident memory of the process.
+
+Run from the project root:
+
+    python -m tests.performance.bench_startup [clubs]
+"""
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from loader import LoadingRegistry, load_records
+from models import Club
+from registry import Registry
+from tests.performance.generate_dataset import club_email, generate_clubs, write_records
+
+STRATEGIES = ('json_load', 'streaming', 'lazy')
+
+
+def load(strategy, path):
+    """Load the clubs, returning seconds to the first lookup and to the full registry."""
+    start = time.perf_counter()
+    if strategy == 'json_load':
+        with open(path) as clubs_file:
+            clubs = Registry(map(Club.from_dict, json.load(clubs_file)['clubs']), keys=('name', 'email'))
+    elif strategy == 'streaming':
+        clubs = Registry(keys=('name', 'email'))
+        load_records(path, 'clubs', Club.from_dict, clubs)
+    else:
+        clubs = LoadingRegistry(keys=('name', 'email')).load(
+            lambda registry: load_records(path, 'clubs', Club.from_dict, registry))
+    assert clubs.get('email', club_email(0)) is not None
+    first_lookup = time.perf_counter() - start
+    len(clubs)
+    return first_lookup, time.perf_counter() - start
+
+
+def measure(strategy, path):
+    first_lookup, complete = load(strategy, path)
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({'first_lookup': first_lookup, 'complete': complete, 'peak_mb': peak_mb}))
+
+
+def main(clubs=1_000_000):
+    import random
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'clubs.json')
+        write_records(path, 'clubs', generate_clubs(clubs, random.Random(0)))
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        print(f"{clubs} clubs, {size_mb:.1f} MB")
+        print(f"{'strategy':>10} {'first lookup (s)':>17} {'complete (s)':>13} {'peak RSS (MB)':>14}")
+        for strategy in STRATEGIES:
+            # a fresh interpreter per strategy, so peak memory is not shared between them
+            output = subprocess.run(
+                [sys.executable, '-m', 'tests.performance.bench_startup', '--measure', strategy, path],
+                check=True, capture_output=True, text=True).stdout
+            result = json.loads(output)
+            print(f"{strategy:>10} {result['first_lookup']:>17.3f} {result['complete']:>13.3f} "
+                  f"{result['peak_mb']:>14.0f}")
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--measure']:
+        measure(*sys.argv[2:4])
+    else:
+        main(*(int(arg) for arg in sys.argv[1:]))
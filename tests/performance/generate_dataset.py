@@ -0,0 +1,86 @@
+"""Generate clubs.json and competitions.json of any size for load tests.
+
+Run from the project root:
+
+    python -m tests.performance.generate_dataset --clubs 100000 --competitions 1000 --output-dir /tmp/gudlft
+
+Names and emails follow the record index (``Club 42``, ``secretary@club42.gudlft.test``),
+so the Locust users can pick random records without loading the files. A
+``dataset.json`` manifest next to them records the sizes.
+"""
+import argparse
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+from models import DATE_FORMAT
+
+MANIFEST = 'dataset.json'
+
+
+def club_name(i):
+    return f"Club {i}"
+
+
+def club_email(i):
+    return f"secretary@club{i}.gudlft.test"
+
+
+def competition_name(i):
+    return f"Competition {i}"
+
+
+def generate_clubs(count, rng):
+    for i in range(count):
+        yield {"name": club_name(i), "email": club_email(i), "points": str(rng.randint(0, 30))}
+
+
+def generate_competitions(count, rng, past_ratio=0.1):
+    now = datetime.now().replace(microsecond=0)
+    for i in range(count):
+        days = rng.randint(1, 365)
+        date = now - timedelta(days=days) if rng.random() < past_ratio else now + timedelta(days=days)
+        yield {
+            "name": competition_name(i),
+            "date": date.strftime(DATE_FORMAT),
+            "number_of_places": str(rng.randint(5, 200)),
+        }
+
+
+def write_records(path, key, records):
+    # written record by record so a million clubs never sit in memory at once
+    with open(path, 'w') as output:
+        output.write(f'{{"{key}": [\n')
+        for position, record in enumerate(records):
+            output.write((',\n' if position else '') + json.dumps(record))
+        output.write('\n]}\n')
+
+
+def generate(output_dir, clubs, competitions, seed=0):
+    rng = random.Random(seed)
+    os.makedirs(output_dir, exist_ok=True)
+    write_records(os.path.join(output_dir, 'clubs.json'), 'clubs', generate_clubs(clubs, rng))
+    write_records(os.path.join(output_dir, 'competitions.json'), 'competitions',
+                  generate_competitions(competitions, rng))
+    with open(os.path.join(output_dir, MANIFEST), 'w') as manifest:
+        json.dump({"clubs": clubs, "competitions": competitions, "seed": seed}, manifest)
+
+
+def load_manifest(dataset_dir):
+    with open(os.path.join(dataset_dir, MANIFEST)) as manifest:
+        return json.load(manifest)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clubs', type=int, default=1_000)
+    parser.add_argument('--competitions', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output-dir', required=True)
+    args = parser.parse_args()
+    generate(args.output_dir, args.clubs, args.competitions, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,32 +1,110 @@
-import locust
-from locust import HttpUser, task
-
-class ProjectPerfTest(HttpUser):
-    
-    email = "kate@shelifts.co.uk"
-    comp_name = "Fall Classic"
-    club_name = "She Lifts"
-    
+import os
+import random
+
+from locust import HttpUser, between, task
+
+from tests.performance.generate_dataset import club_email, club_name, competition_name, load_manifest
+
+# the dataset the server was started on, see generate_dataset.py
+DATASET_DIR = os.environ.get('GUDLFT_DATASET_DIR')
+DATASET = load_manifest(DATASET_DIR) if DATASET_DIR else {"clubs": 3, "competitions": 2}
+DEFAULT_CLUBS = [("Simply Lift", "john@simplylift.co"), ("Iron Temple", "admin@irontemple.com"),
+                 ("She Lifts", "kate@shelifts.co.uk")]
+DEFAULT_COMPETITIONS = ["Spring Festival", "Fall Classic"]
+
+
+def random_club():
+    if not DATASET_DIR:
+        return random.choice(DEFAULT_CLUBS)
+    i = random.randrange(DATASET['clubs'])
+    return club_name(i), club_email(i)
+
+
+def random_competition():
+    if not DATASET_DIR:
+        return random.choice(DEFAULT_COMPETITIONS)
+    return competition_name(random.randrange(DATASET['competitions']))
+
+
+class ClubSecretary(HttpUser):
+    """Logs in as a random club and books places in random competitions."""
+
+    weight = 10
+    wait_time = between(0.5, 2)
+
     def on_start(self):
-        self.client.post("/show-summary", {
-            "email": self.email
-        })
-        
-    @task
+        self.club_name, self.email = random_club()
+        self.client.post("/show-summary", {"email": self.email})
+
+    @task(1)
     def home(self):
-        response = self.client.get("/")
-          
-    @task
+        self.client.get("/")
+
+    @task(4)
     def login(self):
-        response = self.client.post("/show-summary", {"email": self.email})
-        
-    @task 
+        self.client.post("/show-summary", {"email": self.email})
+
+    @task(4)
     def book(self):
-        response = self.client.get(f'/book/{self.comp_name}/{self.club_name}')
-    
-    @task()
+        self.client.get(f'/book/{random_competition()}/{self.club_name}', name='/book/[competition]/[club]')
+
+    @task(2)
     def purchase_places(self):
-        response = self.client.post('/purchase-places', {"club":self.club_name, "competition":self.comp_name, "places": 1})
-        
+        self.client.post('/purchase-places', {
+            "club": self.club_name,
+            "competition": random_competition(),
+            "places": random.randint(1, 3),
+        })
+
+    @task(1)
+    def purchase_places_batch(self):
+        competitions = [random_competition() for _ in range(3)]
+        self.client.post('/purchase-places/batch', {
+            "club": self.club_name,
+            "competition": competitions,
+            "places": [1] * len(competitions),
+        })
+
     def on_stop(self):
         self.client.get("/logout")
+
+
+class PointsBoardVisitor(HttpUser):
+    """Browses the public points board page by page."""
+
+    weight = 3
+    wait_time = between(1, 3)
+
+    @task(5)
+    def first_page(self):
+        self.client.get("/points-board")
+
+    @task(2)
+    def random_page(self):
+        cursor = random.randrange(max(DATASET['clubs'] - 20, 1))
+        self.client.get(f"/points-board?cursor={cursor}", name="/points-board?cursor=[cursor]")
+
+
+class AvailabilityPoller(HttpUser):
+    """Front-end polling remaining places with conditional requests."""
+
+    weight = 2
+    wait_time = between(1, 2)
+
+    def on_start(self):
+        self.etags = {}
+
+    def poll(self, path):
+        headers = {'If-None-Match': self.etags[path]} if path in self.etags else {}
+        with self.client.get(path, headers=headers, catch_response=True) as response:
+            if response.status_code in (200, 304):
+                self.etags[path] = response.headers.get('ETag', self.etags.get(path))
+                response.success()
+
+    @task(3)
+    def competitions(self):
+        self.poll("/api/competitions")
+
+    @task(1)
+    def clubs(self):
+        self.poll("/api/clubs")
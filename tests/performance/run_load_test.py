@@ -0,0 +1,137 @@
+"""Run the Locust suite headless and record latency percentiles per route.
+
+Run from the project root, against a generated dataset:
+
+    python -m tests.performance.generate_dataset --clubs 100000 --competitions 1000 --output-dir /tmp/gudlft
+    python -m tests.performance.run_load_test --dataset-dir /tmp/gudlft --label v1.2 --users 200 --run-time 2m
+
+Unless ``--host`` is given, a local server is started on the dataset. The
+results (p50/p95/p99 in ms and requests/s per route) are written to
+``tests/performance/results/<label>.json``; pass ``--baseline`` with an
+earlier results file to print the change for every route.
+"""
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+LOCUSTFILE = os.path.join(ROOT_DIR, 'tests', 'performance', 'locustfile.py')
+RESULTS_DIR = os.path.join(ROOT_DIR, 'tests', 'performance', 'results')
+
+
+def start_server(dataset_dir, port, command=None):
+    env = dict(os.environ, FLASK_APP='server', PYTHONPATH=ROOT_DIR)
+    if dataset_dir:
+        env['GUDLFT_CLUBS_PATH'] = os.path.join(dataset_dir, 'clubs.json')
+        env['GUDLFT_COMPETITIONS_PATH'] = os.path.join(dataset_dir, 'competitions.json')
+    command = command or [sys.executable, '-m', 'flask', 'run', '--port', str(port), '--with-threads']
+    server = subprocess.Popen(
+        command,
+        cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    host = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(host + '/', timeout=1)
+            return server, host
+        except OSError:
+            if server.poll() is not None:
+                raise RuntimeError('the server exited before answering')
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError('the server did not answer within 120s')
+
+
+def run_locust(host, dataset_dir, users, spawn_rate, run_time, csv_prefix):
+    env = dict(os.environ, PYTHONPATH=ROOT_DIR)
+    if dataset_dir:
+        env['GUDLFT_DATASET_DIR'] = dataset_dir
+    subprocess.run(
+        [sys.executable, '-m', 'locust', '-f', LOCUSTFILE, '--headless', '--host', host,
+         '--users', str(users), '--spawn-rate', str(spawn_rate), '--run-time', run_time,
+         '--csv', csv_prefix, '--only-summary'],
+        cwd=ROOT_DIR, env=env, check=False)
+
+
+def read_stats(csv_prefix):
+    routes = {}
+    with open(f'{csv_prefix}_stats.csv', newline='') as stats_file:
+        for row in csv.DictReader(stats_file):
+            name = row['Name'] if row['Name'] == 'Aggregated' else f"{row['Type']} {row['Name']}"
+            routes[name] = {
+                'requests': int(row['Request Count']),
+                'failures': int(row['Failure Count']),
+                'p50_ms': float(row['50%']),
+                'p95_ms': float(row['95%']),
+                'p99_ms': float(row['99%']),
+                'rps': float(row['Requests/s']),
+            }
+    return routes
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)['routes']
+    print(f"{'route':<45} {'p95 ms':>16} {'p99 ms':>16} {'rps':>16}")
+    for name, stats in results['routes'].items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        print(f"{name:<45} "
+              + ' '.join(f"{before[key]:>7.0f}->{stats[key]:<7.0f}" for key in ('p95_ms', 'p99_ms', 'rps')))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--label', required=True, help='name of the results file, e.g. the release')
+    parser.add_argument('--dataset-dir', help='output of generate_dataset; the repository JSON files otherwise')
+    parser.add_argument('--host', help='test a running server instead of starting one')
+    parser.add_argument('--port', type=int, default=5077)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--spawn-rate', type=float, default=20)
+    parser.add_argument('--run-time', default='1m')
+    parser.add_argument('--baseline', help='earlier results file to compare with')
+    args = parser.parse_args()
+
+    server = None
+    host = args.host
+    if host is None:
+        server, host = start_server(args.dataset_dir, args.port)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            csv_prefix = os.path.join(directory, 'locust')
+            run_locust(host, args.dataset_dir, args.users, args.spawn_rate, args.run_time, csv_prefix)
+            routes = read_stats(csv_prefix)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    dataset = {}
+    if args.dataset_dir:
+        with open(os.path.join(args.dataset_dir, 'dataset.json')) as manifest:
+            dataset = json.load(manifest)
+    results = {
+        'label': args.label,
+        'dataset': dataset,
+        'users': args.users,
+        'run_time': args.run_time,
+        'routes': routes,
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    results_path = os.path.join(RESULTS_DIR, f'{args.label}.json')
+    with open(results_path, 'w') as results_file:
+        json.dump(results, results_file, indent=4)
+    print(f'results written to {results_path}')
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Fire thousands of concurrent bookings and check nothing is oversold.
+
+Run from the project root:
+
+    python -m tests.performance.stress_booking [bookings] [threads]
+"""
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import booking
+from booking import BookingEngine
+from models import Club, Competition
+
+COMPETITIONS = 50
+PLACES = 100
+CLUBS = 500
+NOW = datetime(2022, 1, 1)
+
+
+def main(bookings=20_000, threads=32):
+    engine = BookingEngine()
+    competitions = [
+        Competition(f"Competition {i}", datetime(2022, 10, 22, 13, 30), PLACES)
+        for i in range(COMPETITIONS)
+    ]
+    clubs = [Club(f"Club {i}", f"secretary@club{i}.com", 1000000) for i in range(CLUBS)]
+
+    def book(i):
+        return engine.book(clubs[i % CLUBS], competitions[i % COMPETITIONS], 1 + i % 3, now=NOW)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        outcomes = list(pool.map(book, range(bookings)))
+    elapsed = time.perf_counter() - start
+
+    sold = COMPETITIONS * PLACES - sum(c.number_of_places for c in competitions)
+    spent = sum(1000000 - c.points for c in clubs)
+    assert all(c.number_of_places >= 0 for c in competitions), 'oversold'
+    assert sold == spent, 'places sold and points spent diverge'
+
+    print(f"{bookings} bookings on {threads} threads in {elapsed:.2f}s "
+          f"({bookings / elapsed:,.0f} bookings/s)")
+    print(f"booked: {outcomes.count(booking.BOOKED)}, "
+          f"refused (no places): {outcomes.count(booking.NOT_ENOUGH_PLACES)}, "
+          f"places sold: {sold}")
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,111 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import booking
+from booking import BookingEngine
+from models import Club, Competition
+
+BEFORE_COMPETITION = datetime(2022, 1, 1)
+
+
+def make_club(points=20, name="Huge shirts"):
+    return Club(name, "huge@shirts.com", points)
+
+
+def make_competition(places=10, date=datetime(2022, 10, 22, 13, 30)):
+    return Competition("Crazy Tournament", date, places)
+
+
+def test_book_should_decrement_points_and_places():
+    club, competition = make_club(), make_competition()
+    outcome = BookingEngine().book(club, competition, 3, now=BEFORE_COMPETITION)
+    assert outcome == booking.BOOKED
+    assert club['points'] == 17
+    assert competition['number_of_places'] == 7
+
+
+def test_book_should_refuse_with_reason_and_change_nothing():
+    engine = BookingEngine()
+    cases = [
+        (make_club(), make_competition(date=datetime(2021, 10, 22, 13, 30)), 1, booking.PAST_COMPETITION),
+        (make_club(points=4), make_competition(), 6, booking.NOT_ENOUGH_POINTS),
+        (make_club(), make_competition(places=20), 13, booking.TOO_MANY_PLACES),
+        (make_club(), make_competition(places=10), 11, booking.NOT_ENOUGH_PLACES),
+    ]
+    for club, competition, places, reason in cases:
+        points, comp_places = club['points'], competition['number_of_places']
+        assert engine.book(club, competition, places, now=BEFORE_COMPETITION) == reason
+        assert club['points'] == points
+        assert competition['number_of_places'] == comp_places
+
+
+def test_concurrent_bookings_should_never_oversell():
+    '''test that clubs racing for the last places cannot book more than available'''
+    engine = BookingEngine()
+    competition = make_competition(places=50)
+    clubs = [make_club(points=1000, name=f"Club {i}") for i in range(20)]
+
+    def book(club):
+        return engine.book(club, competition, 1, now=BEFORE_COMPETITION)
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        outcomes = list(pool.map(book, clubs * 10))
+
+    assert outcomes.count(booking.BOOKED) == 50
+    assert competition['number_of_places'] == 0
+    assert sum(1000 - club['points'] for club in clubs) == 50
+
+
+def test_book_many_should_book_every_item():
+    club = make_club(points=20)
+    first, second = make_competition(places=10), Competition("Super competition", datetime(2022, 10, 22), 5)
+    outcome = BookingEngine().book_many(club, [(first, 4), (second, 5), (first, 2)], now=BEFORE_COMPETITION)
+    assert outcome == (booking.BOOKED, None)
+    assert club.points == 9
+    assert first.number_of_places == 4
+    assert second.number_of_places == 0
+
+
+def test_book_many_should_book_nothing_when_one_item_is_refused():
+    '''test that a batch is all-or-nothing and reports the refused competition'''
+    engine = BookingEngine()
+    club = make_club(points=20)
+    first, second = make_competition(places=10), Competition("Super competition", datetime(2022, 10, 22), 5)
+    cases = [
+        ([(first, 4), (second, 6)], booking.NOT_ENOUGH_PLACES, second),
+        ([(first, 8), (first, 5)], booking.TOO_MANY_PLACES, first),
+        ([(first, 10), (second, 5), (Competition("Past", datetime(2021, 1, 1), 5), 1)], booking.PAST_COMPETITION, None),
+        ([(first, 10), (second, 5), (Competition("Magic festival", datetime(2022, 10, 22), 10), 6)],
+         booking.NOT_ENOUGH_POINTS, None),
+    ]
+    for items, reason, refused in cases:
+        outcome, refused_competition = engine.book_many(club, items, now=BEFORE_COMPETITION)
+        assert outcome == reason
+        assert refused is None or refused_competition is refused
+        assert club.points == 20
+        assert (first.number_of_places, second.number_of_places) == (10, 5)
+
+
+def test_places_cap_should_count_earlier_bookings_of_the_club():
+    engine = BookingEngine()
+    club, competition = make_club(), make_competition(places=20)
+    assert engine.book(club, competition, 8, now=BEFORE_COMPETITION) == booking.BOOKED
+    assert engine.book(club, competition, 5, now=BEFORE_COMPETITION) == booking.TOO_MANY_PLACES
+    assert engine.book_many(club, [(competition, 4)], now=BEFORE_COMPETITION) == (booking.BOOKED, None)
+    assert engine.book(club, competition, 1, now=BEFORE_COMPETITION) == booking.TOO_MANY_PLACES
+    assert engine.ledger.club_totals(club.name) == {'bookings': 2, 'places': 12, 'competitions': 1}
+    assert club['points'] == 8
+
+
+def test_places_below_one_should_be_refused_and_not_undo_the_cap():
+    engine = BookingEngine()
+    club, competition = make_club(points=30), make_competition(places=20)
+    assert engine.book(club, competition, 12, now=BEFORE_COMPETITION) == booking.BOOKED
+    assert engine.book(club, competition, -12, now=BEFORE_COMPETITION) == booking.INVALID_PLACES
+    assert engine.book(club, competition, 0, now=BEFORE_COMPETITION) == booking.INVALID_PLACES
+    assert engine.book_many(club, [(competition, -12)], now=BEFORE_COMPETITION) == (booking.INVALID_PLACES, competition)
+    assert engine.book_many(club, [(competition, -12), (competition, 12)], now=BEFORE_COMPETITION) == \
+        (booking.INVALID_PLACES, competition)
+    assert engine.book(club, competition, 12, now=BEFORE_COMPETITION) == booking.TOO_MANY_PLACES
+    assert (club.points, competition.number_of_places) == (18, 8)
+    assert engine.ledger.club_totals(club.name)['places'] == 12
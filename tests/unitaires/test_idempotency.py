@@ -0,0 +1,77 @@
+import threading
+
+import pytest
+
+from idempotency import IdempotencyCache, IdempotencyKeyReused
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_run_should_replay_result_without_running_again():
+    cache = IdempotencyCache()
+    calls = []
+
+    def book():
+        calls.append(1)
+        return 'booked'
+
+    assert cache.run('key', ('purchase', 3), book) == 'booked'
+    assert cache.run('key', ('purchase', 3), book) == 'booked'
+    assert len(calls) == 1
+    with pytest.raises(IdempotencyKeyReused):
+        cache.run('key', ('purchase', 4), book)
+
+
+def test_run_should_forget_keys_after_ttl_and_beyond_max_entries():
+    clock = FakeClock()
+    cache = IdempotencyCache(max_entries=2, ttl=10, clock=clock)
+    cache.run('first', None, lambda: 1)
+    cache.run('second', None, lambda: 2)
+    # a hit makes 'first' the most recently used, so 'second' is evicted
+    assert cache.run('first', None, lambda: 'again') == 1
+    cache.run('third', None, lambda: 3)
+    assert cache.run('second', None, lambda: 'again') == 'again'
+    assert len(cache) == 2
+
+    clock.now = 11
+    assert cache.run('first', None, lambda: 'expired') == 'expired'
+
+
+def test_run_should_make_concurrent_retry_wait_for_first_result():
+    cache = IdempotencyCache()
+    started = threading.Event()
+    release = threading.Event()
+    results = []
+
+    def slow_book():
+        started.set()
+        release.wait()
+        return 'booked'
+
+    first = threading.Thread(target=lambda: results.append(cache.run('key', None, slow_book)))
+    first.start()
+    started.wait()
+    retry = threading.Thread(target=lambda: results.append(cache.run('key', None, lambda: 'twice')))
+    retry.start()
+    release.set()
+    first.join()
+    retry.join()
+
+    assert results == ['booked', 'booked']
+
+
+def test_run_should_let_a_retry_run_after_a_failure():
+    cache = IdempotencyCache()
+
+    def fail():
+        raise RuntimeError('storage unavailable')
+
+    with pytest.raises(RuntimeError):
+        cache.run('key', None, fail)
+    assert cache.run('key', None, lambda: 'booked') == 'booked'
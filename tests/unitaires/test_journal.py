@@ -0,0 +1,196 @@
+import json
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+import journal
+from booking import BookingEngine
+from journal import BookingJournal, JournalFailed
+from models import Club, Competition
+
+BEFORE_COMPETITION = datetime(2022, 1, 1)
+
+
+def make_data():
+    clubs = [Club("Huge shirts", "huge@shirts.com", 20)]
+    competitions = [Competition("Crazy Tournament", datetime(2022, 10, 22, 13, 30), 10)]
+    return clubs, competitions
+
+
+def test_replay_should_restore_journaled_bookings(tmp_path):
+    '''test that bookings survive a restart through the journal'''
+    path = str(tmp_path / 'bookings.journal')
+    for durability in journal.DURABILITY_MODES:
+        clubs, competitions = make_data()
+        booking_journal = BookingJournal(path, durability=durability, batch_ms=1)
+        engine = BookingEngine(journal=booking_journal)
+        engine.book(clubs[0], competitions[0], 2, now=BEFORE_COMPETITION)
+        engine.book(clubs[0], competitions[0], 3, now=BEFORE_COMPETITION)
+        booking_journal.close()
+
+    clubs, competitions = make_data()
+    journal.replay(clubs, path, 0, 'club', 'points')
+    journal.replay(competitions, path, 0, 'competition', 'number_of_places')
+    assert clubs[0]['points'] == 10
+    assert competitions[0]['number_of_places'] == 0
+
+
+def test_replay_should_ignore_torn_last_entry(tmp_path):
+    path = tmp_path / 'bookings.journal'
+    path.write_text('{"club": "Huge shirts", "competition": "Crazy Tournament", "places": 1, "seq": 1}\n{"club": "Hu')
+    booking_journal = BookingJournal(str(path), durability=journal.ALWAYS)
+    assert booking_journal.append({"club": "Huge shirts", "competition": "Crazy Tournament", "places": 2}) == 2
+    booking_journal.close()
+
+    clubs, _ = make_data()
+    journal.replay(clubs, str(path), 0, 'club', 'points')
+    assert clubs[0]['points'] == 17
+
+
+def test_compact_should_fold_journal_into_snapshots(tmp_path):
+    '''test that compaction writes the snapshot and only later bookings get replayed'''
+    path = str(tmp_path / 'bookings.journal')
+    snapshot_path = str(tmp_path / 'clubs.json')
+    clubs, competitions = make_data()
+    booking_journal = BookingJournal(path, durability=journal.ALWAYS)
+    engine = BookingEngine(journal=booking_journal)
+    engine.book(clubs[0], competitions[0], 2, now=BEFORE_COMPETITION)
+
+    def write(data, seq):
+        journal.write_snapshot(snapshot_path, 'clubs', data, seq)
+
+    seq = booking_journal.compact(lambda: [club.to_dict() for club in clubs], write)
+    engine.book(clubs[0], competitions[0], 1, now=BEFORE_COMPETITION)
+    booking_journal.close()
+
+    assert journal.segments(path) == []
+    with open(snapshot_path) as snapshot_file:
+        snapshot = json.load(snapshot_file)
+    assert snapshot['journal_seq'] == seq
+    assert snapshot['clubs'][0]['points'] == '18'
+
+    loaded = [Club.from_dict(club) for club in snapshot['clubs']]
+    journal.replay(loaded, path, snapshot['journal_seq'], 'club', 'points')
+    assert loaded[0].points == 17
+    reopened = BookingJournal(path)
+    assert reopened.last_seq == seq + 1
+    reopened.close()
+
+
+def test_replay_should_restore_batch_bookings(tmp_path):
+    path = str(tmp_path / 'bookings.journal')
+    clubs, competitions = make_data()
+    other = Competition("Super competition", datetime(2022, 10, 22, 13, 30), 20)
+    booking_journal = BookingJournal(path, durability=journal.ALWAYS)
+    BookingEngine(journal=booking_journal).book_many(
+        clubs[0], [(competitions[0], 2), (other, 3)], now=BEFORE_COMPETITION)
+    booking_journal.close()
+
+    clubs, competitions = make_data()
+    journal.replay(clubs, path, 0, 'club', 'points')
+    journal.replay(competitions, path, 0, 'competition', 'number_of_places')
+    assert clubs[0].points == 15
+    assert competitions[0].number_of_places == 8
+
+
+
+def test_bookings_since_should_list_single_bookings_with_their_time(tmp_path):
+    path = str(tmp_path / 'bookings.journal')
+    clubs, competitions = make_data()
+    other = Competition("Super competition", datetime(2022, 10, 22, 13, 30), 20)
+    booking_journal = BookingJournal(path, durability=journal.ALWAYS)
+    engine = BookingEngine(journal=booking_journal)
+    engine.book(clubs[0], competitions[0], 1, now=BEFORE_COMPETITION)
+    engine.book_many(clubs[0], [(competitions[0], 2), (other, 3)], now=BEFORE_COMPETITION)
+    booking_journal.close()
+
+    bookings = [(single['competition'], single['places'], single['at']) for single in journal.bookings_since(path, 0)]
+    assert bookings == [("Crazy Tournament", 1, "2022-01-01 00:00:00"), ("Crazy Tournament", 2, "2022-01-01 00:00:00"),
+                        ("Super competition", 3, "2022-01-01 00:00:00")]
+    assert len(list(journal.bookings_since(path, 1))) == 2
+
+def test_journal_should_sync_through_given_fsync(tmp_path):
+    synced = []
+    booking_journal = BookingJournal(str(tmp_path / 'bookings.journal'), durability=journal.ALWAYS,
+                                     fsync=synced.append)
+    booking_journal.append({'club': 'Simply Lift', 'competition': 'Fall Classic', 'places': 1})
+    booking_journal.close()
+
+    assert len(synced) == 2
+
+
+
+def test_compaction_should_write_snapshots_through_the_journal_hooks(tmp_path):
+    synced, offloaded = [], []
+    booking_journal = BookingJournal(str(tmp_path / 'bookings.journal'), durability=journal.ALWAYS,
+                                     fsync=synced.append)
+
+    def offload(function, *args):
+        offloaded.append(function)
+        return function(*args)
+    booking_journal.offload = offload
+
+    def write(data, seq):
+        journal.write_snapshot(str(tmp_path / 'clubs.json'), 'clubs', data, seq, fsync=booking_journal.fsync)
+
+    booking_journal.append({'club': 'Simply Lift', 'competition': 'Fall Classic', 'places': 1})
+    synced.clear()
+    booking_journal.compact(lambda: [], write)
+    booking_journal.close()
+
+    assert offloaded == [write]
+    # the journal before the rotation, the new journal, the snapshot, then close
+    assert len(synced) == 4
+
+def test_failed_batch_sync_should_fail_bookings_instead_of_hanging(tmp_path):
+    def fsync(fd):
+        raise OSError(28, 'No space left on device')
+    clubs, competitions = make_data()
+    booking_journal = BookingJournal(str(tmp_path / 'bookings.journal'), durability=journal.BATCHED, batch_ms=1,
+                                     fsync=fsync)
+    engine = BookingEngine(journal=booking_journal)
+
+    with pytest.raises(JournalFailed):
+        engine.book(clubs[0], competitions[0], 2, now=BEFORE_COMPETITION)
+    with pytest.raises(JournalFailed):
+        engine.book(clubs[0], competitions[0], 1, now=BEFORE_COMPETITION)
+    assert clubs[0].points == 18
+
+
+def test_failed_write_should_leave_memory_untouched_and_refuse_compaction(tmp_path):
+    def fsync(fd):
+        raise OSError(5, 'Input/output error')
+    clubs, competitions = make_data()
+    booking_journal = BookingJournal(str(tmp_path / 'bookings.journal'), durability=journal.ALWAYS, fsync=fsync)
+    engine = BookingEngine(journal=booking_journal)
+
+    with pytest.raises(JournalFailed):
+        engine.book(clubs[0], competitions[0], 2, now=BEFORE_COMPETITION)
+    assert (clubs[0].points, competitions[0].number_of_places) == (20, 10)
+    assert len(engine.ledger) == 0
+    with pytest.raises(JournalFailed):
+        booking_journal.compact(lambda: clubs, lambda state, seq: None)
+
+
+def test_compaction_loop_should_survive_a_failed_compaction(tmp_path):
+    clubs, competitions = make_data()
+    booking_journal = BookingJournal(str(tmp_path / 'bookings.journal'), durability=journal.ALWAYS)
+    engine = BookingEngine(journal=booking_journal)
+    written = threading.Event()
+    attempts = []
+
+    def write(state, seq):
+        attempts.append(seq)
+        if len(attempts) == 1:
+            raise OSError(28, 'No space left on device')
+        written.set()
+
+    booking_journal.compact_every(0.01, lambda: None, write)
+    engine.book(clubs[0], competitions[0], 2, now=BEFORE_COMPETITION)
+    time.sleep(0.05)
+    engine.book(clubs[0], competitions[0], 1, now=BEFORE_COMPETITION)
+    assert written.wait(5)
+    booking_journal.close()
+    assert len(attempts) >= 2
@@ -0,0 +1,34 @@
+from datetime import datetime
+
+from ledger import BookingLedger
+from models import Booking
+
+BOOKINGS = [
+    Booking("Huge shirts", "Spring Festival", 3, datetime(2022, 1, 1, 9)),
+    Booking("Hungry Birds", "Spring Festival", 2, datetime(2022, 1, 1, 10)),
+    Booking("Huge shirts", "Fall Classic", 1, None),
+    Booking("Huge shirts", "Spring Festival", 4, datetime(2022, 1, 2, 9)),
+]
+
+
+def test_ledger_should_keep_history_and_totals_per_club():
+    ledger = BookingLedger(BOOKINGS)
+    assert [(entry.competition, entry.places) for entry in ledger.history("Huge shirts")] == \
+        [("Spring Festival", 3), ("Fall Classic", 1), ("Spring Festival", 4)]
+    assert ledger.club_totals("Huge shirts") == {'bookings': 3, 'places': 8, 'competitions': 2}
+    assert ledger.booked("Huge shirts", "Spring Festival") == 7
+    assert ledger.history("Unknown") == []
+    assert ledger.club_totals("Unknown") == {'bookings': 0, 'places': 0, 'competitions': 0}
+
+
+def test_ledger_should_keep_totals_per_competition():
+    ledger = BookingLedger(BOOKINGS)
+    assert ledger.competition_totals("Spring Festival") == {'bookings': 3, 'places': 9, 'clubs': 2}
+    assert ledger.competition_totals("Fall Classic") == {'bookings': 1, 'places': 1, 'clubs': 1}
+    assert len(ledger) == 4
+
+
+def test_bookings_should_round_trip_through_dicts():
+    for entry in BOOKINGS:
+        assert Booking.from_dict(entry.to_dict()).to_dict() == entry.to_dict()
+    assert Booking.from_dict(BOOKINGS[2].to_dict()).booked_at is None
@@ -0,0 +1,64 @@
+import json
+import threading
+
+import pytest
+
+from loader import LoadingRegistry, load_records
+from models import Club
+
+CLUBS = [
+    {"name": "Simply Lift", "email": "john@simplylift.co", "points": "13"},
+    {"name": "Iron Temple", "email": "admin@irontemple.com", "points": "4"},
+    {"name": "She Lifts", "email": "kate@shelifts.co.uk", "points": "12"},
+]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 65536])
+def test_load_records_should_match_json_load(tmp_path, chunk_size):
+    path = tmp_path / 'clubs.json'
+    path.write_text(json.dumps({'clubs': CLUBS, 'journal_seq': 1234}, indent=4))
+
+    records = []
+    fields = load_records(str(path), 'clubs', Club.from_dict, records, chunk_size=chunk_size)
+
+    assert records == [Club.from_dict(club) for club in CLUBS]
+    assert fields == {'journal_seq': 1234}
+
+
+def test_load_records_should_refuse_a_truncated_file(tmp_path):
+    path = tmp_path / 'clubs.json'
+    path.write_text(json.dumps({'clubs': CLUBS})[:-20])
+
+    with pytest.raises(ValueError):
+        load_records(str(path), 'clubs', Club.from_dict, [])
+
+
+def test_loading_registry_should_answer_lookups_before_the_load_ends():
+    first_read = threading.Event()
+    finish = threading.Event()
+
+    def fill(registry):
+        registry.append(Club.from_dict(CLUBS[0]))
+        first_read.set()
+        finish.wait()
+        for club in CLUBS[1:]:
+            registry.append(Club.from_dict(club))
+
+    registry = LoadingRegistry(keys=('name', 'email')).load(fill)
+    first_read.wait()
+    assert registry.get('email', 'john@simplylift.co').name == 'Simply Lift'
+
+    finish.set()
+    # a miss waits for the whole file before answering
+    assert registry.get('email', 'kate@shelifts.co.uk').name == 'She Lifts'
+    assert registry.get('email', 'unknown@club.com') is None
+    assert len(registry) == 3
+
+
+def test_loading_registry_should_raise_when_the_load_failed():
+    def fill(registry):
+        raise ValueError('truncated file')
+
+    registry = LoadingRegistry().load(fill)
+    with pytest.raises(RuntimeError):
+        registry.get('name', 'Simply Lift')
@@ -0,0 +1,61 @@
+from datetime import datetime
+
+import metrics
+from metrics import Histogram, InstrumentedStorage, Metrics
+from models import Club, Competition
+from registry import Registry
+from storage import JsonStorage
+
+from ... import server
+from ...server import app
+
+
+def test_histogram_should_count_values_in_cumulative_buckets():
+    histogram = Histogram(buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value)
+    assert list(histogram.cumulative_counts()) == [(0.1, 2), (1, 3), (float('inf'), 4)]
+    assert histogram.count == 4
+    assert histogram.sum == 3.65
+
+
+def test_render_should_use_prometheus_text_format():
+    registry = Metrics()
+    registry.increment(metrics.BOOKINGS, outcome='booked')
+    registry.observe(metrics.REQUEST_DURATION, 0.002, endpoint='index')
+    text = registry.render()
+    assert '# TYPE gudlft_bookings_total counter' in text
+    assert 'gudlft_bookings_total{outcome="booked"} 1' in text
+    assert 'gudlft_request_duration_seconds_bucket{endpoint="index",le="0.001"} 0' in text
+    assert 'gudlft_request_duration_seconds_bucket{endpoint="index",le="0.0025"} 1' in text
+    assert 'gudlft_request_duration_seconds_count{endpoint="index"} 1' in text
+
+
+def test_instrumented_storage_should_count_bookings_by_outcome():
+    '''test that every booking attempt is counted with its outcome and timed'''
+    registry = Metrics()
+    club = Club("Huge shirts", "huge@shirts.com", 4)
+    competition = Competition("Crazy Tournament", datetime(2099, 10, 22, 13, 30), 10)
+    storage = InstrumentedStorage(JsonStorage(Registry([club], keys=('name', 'email')), Registry([competition])), registry)
+
+    storage.book(club, competition, 2)
+    storage.book(club, competition, 13)
+    storage.book(club, competition, 3)
+    storage.book_many(club, [(competition, 1)])
+
+    assert registry.counter(metrics.BOOKINGS, outcome='booked') == 2
+    assert registry.counter(metrics.BOOKINGS, outcome='not_enough_points') == 2
+    assert registry.histogram(metrics.STORAGE_DURATION, operation='book').count == 3
+    assert storage.get_club("Huge shirts") is club
+
+
+def test_metrics_endpoint_should_expose_route_and_render_latency(mocker):
+    mocker.patch.object(server, 'METRICS', Metrics())
+    client = app.test_client()
+    client.get('/')
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert b'gudlft_request_duration_seconds_count{endpoint="index"} 1' in response.data
+    assert b'gudlft_template_render_seconds_count{template="index.html"} 1' in response.data
@@ -0,0 +1,45 @@
+from profiling import RequestProfiler
+
+from ... import server
+from ...server import app
+
+
+def test_profiler_should_sample_nothing_at_zero_rate():
+    assert RequestProfiler(0).start() is None
+
+
+def test_profiler_should_aggregate_samples_per_endpoint(tmp_path):
+    profiler = RequestProfiler(1, output_dir=str(tmp_path))
+    for _ in range(2):
+        profile = profiler.start()
+        sorted(range(1000))
+        profiler.stop(profile, 'index')
+
+    assert profiler.samples() == {'index': 2}
+    assert 'sorted' in profiler.report('index')
+    assert profiler.report('book') is None
+    assert (tmp_path / 'index.prof').exists()
+
+
+def test_profiles_endpoint_should_require_token(mocker):
+    '''test that sampled profiles are only served with the configured token'''
+    mocker.patch.object(server, 'PROFILER', RequestProfiler(1))
+    mocker.patch.object(server, 'PROFILE_TOKEN', 'secret')
+    client = app.test_client()
+    client.get('/')
+
+    assert client.get('/profiles').status_code == 403
+    assert client.get('/profiles/index', headers={'X-Profile-Token': 'wrong'}).status_code == 403
+    assert client.get('/profiles', headers={'X-Profile-Token': 'sécret'}).status_code == 403
+
+    response = client.get('/profiles', headers={'X-Profile-Token': 'secret'})
+    assert response.status_code == 200
+    assert b'index 1' in response.data
+    response = client.get('/profiles/index?sort=tottime', headers={'X-Profile-Token': 'secret'})
+    assert response.status_code == 200
+    assert b'function calls' in response.data
+
+
+def test_profiles_endpoint_should_not_exist_when_profiling_is_off(mocker):
+    mocker.patch.object(server, 'PROFILER', None)
+    assert app.test_client().get('/profiles').status_code == 404
@@ -0,0 +1,39 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from ratelimit import MemoryBackend, RateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_limiter_should_allow_burst_then_refill_at_rate():
+    clock = FakeClock()
+    limiter = RateLimiter(rate=2, burst=3, clock=clock)
+    assert [limiter.hit('ip:10.0.0.1') for _ in range(3)] == [0, 0, 0]
+    assert limiter.hit('ip:10.0.0.1') == 0.5
+    assert limiter.hit('ip:10.0.0.2') == 0
+
+    clock.now = 0.5
+    assert limiter.hit('ip:10.0.0.1') == 0
+    assert limiter.hit('ip:10.0.0.1') == 0.5
+    clock.now = 100
+    assert [limiter.hit('ip:10.0.0.1') for _ in range(4)] == [0, 0, 0, 0.5]
+
+
+def test_memory_backend_should_bound_buckets_per_shard():
+    backend = MemoryBackend(shards=4, max_keys=8)
+    for i in range(100):
+        backend.take(f'email:{i}', 1, 1, 0)
+    assert len(backend) <= 8
+
+
+def test_concurrent_hits_should_never_exceed_burst():
+    limiter = RateLimiter(rate=0.001, burst=50, clock=lambda: 0.0)
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        waits = list(pool.map(lambda _: limiter.hit('ip:10.0.0.1'), range(500)))
+    assert waits.count(0) == 50
@@ -0,0 +1,56 @@
+from registry import Registry
+
+
+def make_registry():
+    return Registry([
+        {"name": "Simply Lift", "email": "john@simplylift.co", "points": "13"},
+        {"name": "Iron Temple", "email": "admin@irontemple.com", "points": "4"},
+    ], keys=('name', 'email'))
+
+
+def test_get_should_find_record_by_each_key():
+    registry = make_registry()
+    assert registry.get('name', 'Iron Temple')['email'] == 'admin@irontemple.com'
+    assert registry.get('email', 'john@simplylift.co')['name'] == 'Simply Lift'
+
+
+def test_get_should_return_default_when_missing():
+    registry = make_registry()
+    assert registry.get('email', 'ghost@club.com') is None
+    assert registry.get('name', 'Invisible Club', 'default') == 'default'
+
+
+def test_append_and_remove_should_keep_indexes_in_sync():
+    '''test that indexes follow records added and removed after loading'''
+    registry = make_registry()
+    club = {"name": "She Lifts", "email": "kate@shelifts.co.uk", "points": "12"}
+
+    registry.append(club)
+    assert len(registry) == 3
+    assert registry.get('email', 'kate@shelifts.co.uk') is club
+
+    registry.remove(club)
+    assert len(registry) == 2
+    assert club not in registry
+    assert registry.get('email', 'kate@shelifts.co.uk') is None
+    assert registry.get('name', 'She Lifts') is None
+
+
+def test_duplicate_key_should_resolve_to_first_record():
+    '''test that lookups match the first record, like the former list scans'''
+    registry = make_registry()
+    first = registry[0]
+    duplicate = {"name": "Simply Lift", "email": "other@simplylift.co", "points": "1"}
+    registry.append(duplicate)
+    assert registry.get('name', 'Simply Lift') is first
+
+    registry.remove(first)
+    assert registry.get('name', 'Simply Lift') is duplicate
+
+
+def test_registry_should_compare_and_iterate_like_a_list():
+    records = [{"name": "Fall Classic"}]
+    registry = Registry(records)
+    assert registry == records
+    assert list(registry) == records
+    assert registry[0] is records[0]
@@ -0,0 +1,54 @@
+import os
+
+import pytest
+
+from reloader import FileWatcher
+
+
+def touch(path, content):
+    path.write_text(content)
+    # mtime resolution may hide two writes in a row, the size still changes
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 1000000))
+
+
+def test_check_should_call_on_change_once_per_edit(tmp_path):
+    data = tmp_path / 'clubs.json'
+    data.write_text('{}')
+    changes = []
+    watcher = FileWatcher([str(data)], lambda: changes.append(data.read_text()))
+
+    assert not watcher.check()
+    touch(data, '{"clubs": []}')
+    assert watcher.check()
+    assert not watcher.check()
+    assert changes == ['{"clubs": []}']
+
+
+def test_check_should_retry_after_a_failed_reload(tmp_path):
+    data = tmp_path / 'clubs.json'
+    data.write_text('{}')
+    attempts = []
+
+    def on_change():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ValueError('half-written file')
+    watcher = FileWatcher([str(data)], on_change)
+
+    touch(data, '{"clubs"')
+    with pytest.raises(ValueError):
+        watcher.check()
+    assert watcher.check()
+    assert len(attempts) == 2
+
+
+def test_mark_seen_should_ignore_the_apps_own_writes(tmp_path):
+    data = tmp_path / 'clubs.json'
+    data.write_text('{}')
+    changes = []
+    watcher = FileWatcher([str(data)], lambda: changes.append(1))
+
+    touch(data, '{"clubs": []}')
+    watcher.mark_seen()
+    assert not watcher.check()
+    assert changes == []
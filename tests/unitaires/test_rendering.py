@@ -0,0 +1,65 @@
+from datetime import datetime
+
+from flask import Flask, render_template_string
+
+from ... import server
+from ...server import app
+from models import Club, Competition
+from registry import Registry
+from rendering import FragmentCache, compile_templates, use_compiled_templates
+from storage import JsonStorage
+
+
+def test_fragment_cache_should_render_again_only_when_version_changes():
+    cache = FragmentCache()
+    renders = []
+
+    def render():
+        renders.append(1)
+        return f'fragment {len(renders)}'
+
+    assert cache.get('clubs', 1, render) == 'fragment 1'
+    assert cache.get('clubs', 1, render) == 'fragment 1'
+    assert cache.get('clubs', 2, render) == 'fragment 2'
+    assert len(renders) == 2
+
+
+def test_summary_should_show_each_club_its_own_links_and_fresh_counts(mocker):
+    '''test that cached listings are personalised per club and refreshed after a booking'''
+    clubs = Registry([
+        Club("Huge shirts", "huge@shirts.com", 20),
+        Club("Rock & Roll", "rock@roll.com", 10),
+    ], keys=('name', 'email'))
+    competitions = Registry([
+        Competition("Crazy Tournament", datetime(2099, 10, 22, 13, 30), 10),
+    ])
+    mocker.patch.object(server, 'STORAGE', JsonStorage(clubs, competitions))
+    mocker.patch.object(server, 'FRAGMENTS', FragmentCache())
+    client = app.test_client()
+
+    response = client.post('/show-summary', data={'email': 'huge@shirts.com'})
+    assert b'/book/Crazy%20Tournament/Huge%20shirts"' in response.data
+
+    response = client.post('/show-summary', data={'email': 'rock@roll.com'})
+    assert b'/book/Crazy%20Tournament/Rock%20%26%20Roll"' in response.data
+    assert b'Huge%20shirts' not in response.data
+
+    response = client.post('/purchase-places', data={'competition': 'Crazy Tournament', 'club': 'Rock & Roll', 'places': 2})
+    assert b'Number of Places: 8' in response.data
+    assert b'Number of Points: 8' in response.data
+
+
+def test_compiled_templates_should_render_like_their_sources(tmp_path):
+    templates = tmp_path / 'templates'
+    templates.mkdir()
+    (templates / 'greeting.html').write_text('Hello {{ name }}')
+    compiled = tmp_path / 'compiled'
+    compile_templates(Flask(__name__, template_folder=str(templates)), str(compiled))
+    # the sources are gone: the template can only come from its compiled module
+    (templates / 'greeting.html').unlink()
+
+    precompiled_app = Flask(__name__, template_folder=str(templates))
+    use_compiled_templates(precompiled_app, str(compiled))
+    with precompiled_app.app_context():
+        assert render_template_string('{% include "greeting.html" %}', name='<Simply Lift>') == \
+            'Hello &lt;Simply Lift&gt;'
@@ -0,0 +1,49 @@
+from datetime import datetime
+
+from models import Competition
+from search import CompetitionIndex, IndexCache
+
+COMPETITIONS = [
+    Competition("Spring Festival", datetime(2020, 3, 27, 10), 25),
+    Competition("Fall Classic", datetime(2020, 10, 22, 13, 30), 13),
+    Competition("Summer Cup", datetime(2099, 6, 1, 9), 0),
+    Competition("spring open", datetime(2099, 4, 2, 9), 8),
+    Competition("Winter Games", datetime(2099, 1, 15, 9), 30),
+]
+NOW = datetime(2022, 1, 1)
+
+
+def names(competitions):
+    return [competition.name for competition in competitions]
+
+
+def test_query_should_keep_upcoming_competitions_in_date_order():
+    index = CompetitionIndex(COMPETITIONS)
+    assert names(index.query(after=NOW)) == ["Winter Games", "spring open", "Summer Cup"]
+    assert names(index.query(after=NOW, has_places=True)) == ["Winter Games", "spring open"]
+    assert index.past_count(NOW) == 2
+
+
+def test_query_should_filter_date_range_and_name_prefix():
+    index = CompetitionIndex(COMPETITIONS)
+    assert names(index.query(start=datetime(2020, 10, 22, 13, 30), end=datetime(2099, 6, 1, 9))) == \
+        ["Fall Classic", "Winter Games", "spring open"]
+    assert names(index.query(prefix='SPRING')) == ["Spring Festival", "spring open"]
+    assert names(index.query(after=NOW, prefix='spring')) == ["spring open"]
+    assert names(index.query(start=datetime(2099, 1, 1), prefix='s')) == ["spring open", "Summer Cup"]
+    assert index.query(prefix='Autumn') == []
+
+
+def test_query_should_read_places_left_at_query_time():
+    competitions = [Competition("Winter Games", datetime(2099, 1, 15, 9), 1)]
+    index = CompetitionIndex(competitions)
+    competitions[0].number_of_places = 0
+    assert index.query(has_places=True) == []
+
+
+def test_index_cache_should_rebuild_only_for_a_new_list():
+    cache = IndexCache()
+    competitions = list(COMPETITIONS)
+    index = cache.get(competitions)
+    assert cache.get(competitions) is index
+    assert cache.get(list(COMPETITIONS)) is not index
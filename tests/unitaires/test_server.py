@@ -4,6 +4,19 @@ from ... import server
 from ...server import app
 from flask import template_rendered
 from contextlib import contextmanager
+import json
+from datetime import datetime
+from booking import BookingEngine
+from models import Club, Competition
+from ratelimit import RateLimiter
+from registry import Registry
+from idempotency import IdempotencyCache
+from journal import BookingJournal
+from ledger import BookingLedger
+from reloader import FileWatcher
+from rendering import FragmentCache
+from storage import JsonStorage
+from waitlist import WaitlistManager
 from ..mock import CLUBS, COMPETITIONS
 
 
@@ -30,8 +43,7 @@ def test_email_not_found_should_status_code_ok(mocker):
     '''test if user redirected if email not found'''
     with captured_templates(app) as templates:
         
-        mocker.patch.object(server, 'CLUBS', CLUBS)
-        mocker.patch.object(server, 'COMPETITIONS', COMPETITIONS)
+        mocker.patch.object(server, 'STORAGE', JsonStorage(CLUBS, COMPETITIONS))
         
         response = app.test_client().post('/show-summary', data = {'email':'igfhuefn'})
         assert response.status_code == 200       
@@ -41,8 +53,7 @@ def test_email_empty_should_status_code_ok(mocker):
     '''test if user redirected if email is empty'''
     with captured_templates(app) as templates:
         
-        mocker.patch.object(server, 'CLUBS', CLUBS)
-        mocker.patch.object(server, 'COMPETITIONS', COMPETITIONS)
+        mocker.patch.object(server, 'STORAGE', JsonStorage(CLUBS, COMPETITIONS))
         
         response = app.test_client().post('/show-summary', data = {'email':''})
         assert response.status_code == 200       
@@ -53,8 +64,7 @@ def test_logging_should_status_code_ok(mocker):
     '''test if mail adress is recognized to log the user'''
     with captured_templates(app) as templates:
         
-        mocker.patch.object(server, 'CLUBS', CLUBS)
-        mocker.patch.object(server, 'COMPETITIONS', COMPETITIONS)    
+        mocker.patch.object(server, 'STORAGE', JsonStorage(CLUBS, COMPETITIONS))
         data = {'email':'huge@shirts.com'}
         
         response = app.test_client().post('/show-summary', data = data)
@@ -72,8 +82,7 @@ def test_booking_should_status_code_ok(mocker):
         should redirect to booking.html'''
     with captured_templates(app) as templates:
         
-        mocker.patch.object(server, 'CLUBS', CLUBS) # utile ?
-        mocker.patch.object(server, 'COMPETITIONS', COMPETITIONS)
+        mocker.patch.object(server, 'STORAGE', JsonStorage(CLUBS, COMPETITIONS))
    
         club = CLUBS[0]
         club_name = club['name']
@@ -94,8 +103,7 @@ def test_booking_competition_not_found(mocker):
         should redirect to welcome.html'''
     with captured_templates(app) as templates:
         
-        mocker.patch.object(server, 'CLUBS', CLUBS)
-        mocker.patch.object(server, 'COMPETITIONS', COMPETITIONS)
+        mocker.patch.object(server, 'STORAGE', JsonStorage(CLUBS, COMPETITIONS))
    
         club = CLUBS[0]
         club_name = club['name']
@@ -119,8 +127,7 @@ def test_booking_failed_club_not_found(mocker):
         should redirect to index.html'''
     with captured_templates(app) as templates:
         
-        mocker.patch.object(server, 'CLUBS', CLUBS)
-        mocker.patch.object(server, 'COMPETITIONS', COMPETITIONS)
+        mocker.patch.object(server, 'STORAGE', JsonStorage(CLUBS, COMPETITIONS))
    
         club = {   "name":"Invisible Club",
         "email": "ghost@club.com",
@@ -146,8 +153,7 @@ def test_purchase_places_ok(mocker):
         should redirect to welcome.html '''
     with captured_templates(app) as templates:
         
-        mocker.patch.object(server, 'CLUBS', CLUBS)
-        mocker.patch.object(server, 'COMPETITIONS', COMPETITIONS)  
+        mocker.patch.object(server, 'STORAGE', JsonStorage(CLUBS, COMPETITIONS))
         
         competition = COMPETITIONS[1]
         comp_name = competition['name']
@@ -181,8 +187,7 @@ def test_not_enough_available_places(mocker):
         should redirect to welcome.html '''
     with captured_templates(app) as templates:
         
-        mocker.patch.object(server, 'CLUBS', CLUBS)
-        mocker.patch.object(server, 'COMPETITIONS', COMPETITIONS)  
+        mocker.patch.object(server, 'STORAGE', JsonStorage(CLUBS, COMPETITIONS))
         
         competition = COMPETITIONS[1]
         comp_name = competition['name']
@@ -218,8 +223,7 @@ def test_more_than_max_places_required(mocker):
     
     with captured_templates(app) as templates:
     
-        mocker.patch.object(server, 'CLUBS', CLUBS)
-        mocker.patch.object(server, 'COMPETITIONS', COMPETITIONS)  
+        mocker.patch.object(server, 'STORAGE', JsonStorage(CLUBS, COMPETITIONS))
         
         competition = COMPETITIONS[2]
         comp_name = competition['name']
@@ -254,8 +258,7 @@ def test_not_enough_points_to_buy_required_places(mocker):
         should redirect to welcome.html'''
     with captured_templates(app) as templates:
         
-        mocker.patch.object(server, 'CLUBS', CLUBS)
-        mocker.patch.object(server, 'COMPETITIONS', COMPETITIONS)  
+        mocker.patch.object(server, 'STORAGE', JsonStorage(CLUBS, COMPETITIONS))
         
         competition = COMPETITIONS[1]
         comp_name = competition['name']
@@ -290,8 +293,7 @@ def test_competition_is_over(mocker):
         should status code OK 
         should redirect to welcome html"""
     with captured_templates(app) as templates:
-        mocker.patch.object(server, 'CLUBS', CLUBS)
-        mocker.patch.object(server, 'COMPETITIONS', COMPETITIONS)  
+        mocker.patch.object(server, 'STORAGE', JsonStorage(CLUBS, COMPETITIONS))
         
         competition = COMPETITIONS[0]
         comp_name = competition['name']
@@ -314,4 +316,336 @@ def test_competition_is_over(mocker):
         assert context['club'] == club
         
         assert template.name == 'welcome.html'
-    
\ No newline at end of file
+    
+
+def test_points_board_should_paginate_clubs(mocker):
+    '''test that the points board serves clubs one page at a time
+        should status code OK
+        should link to the next page until the last one'''
+    with captured_templates(app) as templates:
+
+        mocker.patch.object(server, 'STORAGE', JsonStorage(CLUBS, COMPETITIONS))
+
+        response = app.test_client().get('/points-board?limit=2')
+        assert response.status_code == 200
+        template, context = templates[0]
+        assert template.name == 'points_board.html'
+        assert context['clubs'] == CLUBS[:2]
+        assert context['next_cursor'] == 2
+
+        response = app.test_client().get('/points-board?limit=2&cursor=2')
+        template, context = templates[1]
+        assert context['clubs'] == CLUBS[2:]
+        assert context['next_cursor'] is None
+        assert b'Next page' not in response.data
+
+
+def test_points_board_export_should_stream_every_club(mocker):
+    '''test that the export streams the whole points board'''
+    mocker.patch.object(server, 'STORAGE', JsonStorage(CLUBS, COMPETITIONS))
+    mocker.patch.object(server, 'EXPORT_BATCH_SIZE', 2)
+
+    response = app.test_client().get('/points-board/export')
+    assert response.status_code == 200
+    assert response.is_streamed
+    for club in CLUBS:
+        assert f"<td>{club['name']}</td>".encode() in response.data
+
+
+def test_api_competitions_should_answer_not_modified_until_a_booking(mocker):
+    '''test that the competitions API honours its ETag
+        should status code 304 while data is unchanged
+        should send the new places once a booking changed them'''
+    storage = JsonStorage(CLUBS, COMPETITIONS)
+    mocker.patch.object(server, 'STORAGE', storage)
+    client = app.test_client()
+
+    response = client.get('/api/competitions')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert [comp['name'] for comp in response.json['competitions']] == [comp['name'] for comp in COMPETITIONS]
+    assert response.json['competitions'][2]['number_of_places'] == int(COMPETITIONS[2]['number_of_places'])
+
+    response = client.get('/api/competitions', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+
+    mocker.patch.object(storage, '_version', 'booked')
+    response = client.get('/api/competitions', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_api_clubs_should_list_points_without_emails(mocker):
+    mocker.patch.object(server, 'STORAGE', JsonStorage(CLUBS, COMPETITIONS))
+
+    response = app.test_client().get('/api/clubs')
+    assert response.status_code == 200
+    assert response.json['clubs'][0] == {'name': CLUBS[0]['name'], 'points': int(CLUBS[0]['points'])}
+    assert b'@' not in response.data
+
+
+def test_purchase_places_batch_should_book_all_competitions(mocker):
+    ''' test batch purchase
+        when every item can be booked
+        should change club points and every competition places
+        should redirect to welcome.html '''
+    with captured_templates(app) as templates:
+        club = Club("Huge shirts", "huge@shirts.com", 20)
+        first = Competition("Crazy Tournament", datetime(2099, 10, 22, 13, 30), 10)
+        second = Competition("Super competition", datetime(2099, 10, 22, 13, 30), 20)
+        storage = JsonStorage(Registry([club], keys=('name', 'email')), Registry([first, second]))
+        mocker.patch.object(server, 'STORAGE', storage)
+
+        data = {"club": club.name, "competition": [first.name, second.name], "places": [2, 3]}
+        response = app.test_client().post('/purchase-places/batch', data=data)
+        assert response.status_code == 200
+        assert b'Great-booking complete !' in response.data
+        assert club.points == 15
+        assert (first.number_of_places, second.number_of_places) == (8, 17)
+        assert templates[0][0].name == 'welcome.html'
+
+
+def test_purchase_places_batch_should_book_nothing_if_one_item_fails(mocker):
+    ''' test batch purchase
+        when one competition has already taken place
+        should not change club points and competition places
+        should flash the refused competition '''
+    mocker.patch.object(server, 'STORAGE', JsonStorage(CLUBS, COMPETITIONS))
+    club = CLUBS[0]
+    club_points = club['points']
+    places = [competition['number_of_places'] for competition in COMPETITIONS]
+
+    data = {"club": club['name'], "competition": [COMPETITIONS[0]['name'], COMPETITIONS[2]['name']], "places": [1, 1]}
+    response = app.test_client().post('/purchase-places/batch', data=data)
+    assert response.status_code == 200
+    assert b'Magic festival: The competition has already taken place' in response.data
+    assert club['points'] == club_points
+    assert [competition['number_of_places'] for competition in COMPETITIONS] == places
+
+
+def test_purchase_places_retried_with_same_idempotency_key_should_book_once(mocker):
+    ''' test purchase retried with the same Idempotency-Key header
+        should book and deduct points once
+        should answer the retry with the original outcome
+        should refuse the key for another purchase '''
+    club = Club("Huge shirts", "huge@shirts.com", 20)
+    competition = Competition("Crazy Tournament", datetime(2099, 10, 22, 13, 30), 10)
+    mocker.patch.object(server, 'STORAGE', JsonStorage(Registry([club], keys=('name', 'email')), Registry([competition])))
+    mocker.patch.object(server, 'IDEMPOTENCY', IdempotencyCache())
+    client = app.test_client()
+    data = {"club": club.name, "competition": competition.name, "places": 3}
+    headers = {'Idempotency-Key': 'a6c1e2f0'}
+
+    for _ in range(2):
+        response = client.post('/purchase-places', data=data, headers=headers)
+        assert response.status_code == 200
+        assert b'Great-booking complete !' in response.data
+    assert (club.points, competition.number_of_places) == (17, 7)
+
+    response = client.post('/purchase-places', data=dict(data, places=2), headers=headers)
+    assert response.status_code == 422
+    assert club.points == 17
+
+
+def test_purchase_places_sold_out_should_join_waitlist_and_report_admission(mocker):
+    ''' test purchase for a sold-out competition
+        should put the club on the waitlist
+        should report the places booked from the waitlist at next login '''
+    club = Club("Huge shirts", "huge@shirts.com", 20)
+    competition = Competition("Crazy Tournament", datetime(2099, 10, 22, 13, 30), 0)
+    storage = JsonStorage(Registry([club], keys=('name', 'email')), Registry([competition]))
+    mocker.patch.object(server, 'STORAGE', storage)
+    mocker.patch.object(server, 'WAITLIST', WaitlistManager())
+    client = app.test_client()
+
+    response = client.post('/purchase-places', data={"club": club.name, "competition": competition.name, "places": 2})
+    assert b'You are number 1 on the waitlist' in response.data
+
+    competition.number_of_places = 5
+    assert server.WAITLIST.admit_all(storage) == 1
+    response = client.post('/show-summary', data={'email': club.email})
+    assert b'2 places were booked for you in Crazy Tournament from the waitlist.' in response.data
+    assert (club.points, competition.number_of_places) == (18, 3)
+
+
+def test_search_competitions_should_filter_and_summary_list_upcoming_only(mocker):
+    ''' test competition search
+        should return the competitions matching every filter
+        should refuse malformed dates
+        summary should only list upcoming competitions '''
+    club = Club("Huge shirts", "huge@shirts.com", 20)
+    competitions = Registry([
+        Competition("Magic festival", datetime(2020, 3, 27, 10), 25),
+        Competition("Crazy Tournament", datetime(2099, 10, 22, 13, 30), 0),
+        Competition("Super competition", datetime(2099, 3, 1, 9), 20),
+    ])
+    mocker.patch.object(server, 'STORAGE', JsonStorage(Registry([club], keys=('name', 'email')), competitions))
+    mocker.patch.object(server, 'FRAGMENTS', FragmentCache())
+    client = app.test_client()
+
+    response = client.get('/api/competitions/search?upcoming=1')
+    assert [comp['name'] for comp in response.json['competitions']] == ["Super competition", "Crazy Tournament"]
+    response = client.get('/api/competitions/search?upcoming=1&has_places=1&prefix=super')
+    assert [comp['name'] for comp in response.json['competitions']] == ["Super competition"]
+    response = client.get('/api/competitions/search?from=2020-01-01&to=2021-01-01')
+    assert [comp['name'] for comp in response.json['competitions']] == ["Magic festival"]
+    assert client.get('/api/competitions/search?from=yesterday').status_code == 400
+
+    response = client.post('/show-summary', data={'email': club.email})
+    assert b'Super competition' in response.data
+    assert b'Magic festival' not in response.data
+
+
+def test_bookings_api_should_return_club_history_and_competition_totals(mocker):
+    ''' test bookings history
+        should list the bookings of the club with its totals
+        should total the bookings of the competition
+        should answer 404 for an unknown club '''
+    club = Club("Huge shirts", "huge@shirts.com", 20)
+    competition = Competition("Crazy Tournament", datetime(2099, 10, 22, 13, 30), 10)
+    mocker.patch.object(server, 'STORAGE', JsonStorage(Registry([club], keys=('name', 'email')), Registry([competition])))
+    client = app.test_client()
+    for places in (2, 3):
+        client.post('/purchase-places', data={"club": club.name, "competition": competition.name, "places": places})
+
+    response = client.get('/api/clubs/Huge shirts/bookings')
+    assert response.json['totals'] == {'bookings': 2, 'places': 5, 'competitions': 1}
+    assert [entry['places'] for entry in response.json['bookings']] == [2, 3]
+    response = client.get('/api/competitions/Crazy Tournament/bookings')
+    assert response.json['totals'] == {'bookings': 2, 'places': 5, 'clubs': 1}
+    assert client.get('/api/clubs/Unknown/bookings').status_code == 404
+
+
+def test_show_summary_should_answer_429_once_attempts_run_out(mocker):
+    ''' test login throttling
+        should let the first attempts of an email through
+        should answer 429 with Retry-After without looking the club up '''
+    mocker.patch.object(server, 'STORAGE', JsonStorage(CLUBS, COMPETITIONS))
+    mocker.patch.object(server, 'LOGIN_EMAIL_LIMITER', RateLimiter(1 / 60, burst=2))
+    client = app.test_client()
+
+    for _ in range(2):
+        assert client.post('/show-summary', data={'email': 'guess@example.com'}).status_code == 200
+    lookup = mocker.spy(server.STORAGE, 'get_club_by_email')
+    response = client.post('/show-summary', data={'email': 'Guess@example.com'})
+    assert response.status_code == 429
+    assert 55 <= int(response.headers['Retry-After']) <= 60
+    assert lookup.call_count == 0
+    assert client.post('/show-summary', data={'email': CLUBS[0]['email']}).status_code == 200
+
+
+def test_compaction_should_keep_data_file_edits_not_reloaded_yet(tmp_path, mocker):
+    ''' test journal compaction racing an edit of the data files
+        should reload the edit before taking the snapshot
+        should not take its own writes for an edit '''
+    paths = {name: str(tmp_path / f'{name}.json') for name in ('clubs', 'competitions', 'bookings')}
+    club = Club("Huge shirts", "huge@shirts.com", 20)
+    competition = Competition("Crazy Tournament", datetime(2099, 10, 22, 13, 30), 10)
+    for name, records in (('clubs', [club]), ('competitions', [competition])):
+        with open(paths[name], 'w') as data_file:
+            json.dump({name: [record.to_dict() for record in records]}, data_file)
+    booking_journal = BookingJournal(str(tmp_path / 'bookings.journal'), durability='always')
+    ledger = BookingLedger()
+    storage = JsonStorage(Registry([club], keys=('name', 'email')), Registry([competition]),
+                          BookingEngine(journal=booking_journal, ledger=ledger))
+    watcher = FileWatcher([paths['clubs'], paths['competitions']], server.reload_data)
+    for name, value in (('CLUBS_PATH', paths['clubs']), ('COMPETITIONS_PATH', paths['competitions']),
+                        ('BOOKINGS_PATH', paths['bookings']), ('JOURNAL_PATH', booking_journal.path),
+                        ('JOURNAL', booking_journal), ('LEDGER', ledger), ('STORAGE', storage),
+                        ('WATCHER', watcher), ('WAITLIST', WaitlistManager())):
+        mocker.patch.object(server, name, value)
+    storage.book(club, competition, 2, now=datetime(2022, 1, 1))
+
+    with open(paths['competitions'], 'w') as data_file:
+        # the file as written before the booking, which the journal replays onto
+        json.dump({'competitions': [dict(competition.to_dict(), number_of_places="10"), {
+            'name': "Spring Festival", 'date': "2099-03-27 10:00:00", 'number_of_places': "25"}]}, data_file)
+    with server.data_files_held():
+        booking_journal.compact(server.snapshot_data, server.write_snapshots)
+    booking_journal.close()
+
+    with open(paths['competitions']) as data_file:
+        names = [comp['name'] for comp in json.load(data_file)['competitions']]
+    assert names == ["Crazy Tournament", "Spring Festival"]
+    assert storage.get_competition("Spring Festival") is not None
+    assert storage.get_competition("Crazy Tournament").number_of_places == 8
+    assert not watcher.check()
+
+
+def test_summary_should_only_embed_first_page_of_points_board(mocker):
+    ''' test summary page with more clubs than a points board page
+        should list the first page only
+        should link to the rest of the points board '''
+    clubs = Registry([Club(f"Club {i:02}", f"secretary@club{i}.com", 10) for i in range(30)], keys=('name', 'email'))
+    mocker.patch.object(server, 'STORAGE', JsonStorage(clubs, Registry([])))
+    mocker.patch.object(server, 'FRAGMENTS', FragmentCache())
+
+    response = app.test_client().post('/show-summary', data={'email': 'secretary@club0.com'})
+    assert b'Club 19' in response.data
+    assert b'Club 20' not in response.data
+    assert b'/points-board?cursor=20' in response.data
+
+
+def test_failed_journal_should_answer_503_and_stop_serving(tmp_path, mocker):
+    ''' test purchase when the journal cannot be written
+        should answer 503 without changing points and places
+        should refuse every later request until a restart '''
+    def fsync(fd):
+        raise OSError(5, 'Input/output error')
+    club = Club("Huge shirts", "huge@shirts.com", 20)
+    competition = Competition("Crazy Tournament", datetime(2099, 10, 22, 13, 30), 10)
+    booking_journal = BookingJournal(str(tmp_path / 'bookings.journal'), durability='always', fsync=fsync)
+    storage = JsonStorage(Registry([club], keys=('name', 'email')), Registry([competition]),
+                          BookingEngine(journal=booking_journal))
+    mocker.patch.object(server, 'STORAGE', storage)
+    mocker.patch.object(server, 'JOURNAL', booking_journal)
+    client = app.test_client()
+
+    response = client.post('/purchase-places', data={"club": club.name, "competition": competition.name, "places": 2})
+    assert response.status_code == 503
+    assert (club.points, competition.number_of_places) == (20, 10)
+    assert client.get('/').status_code == 503
+
+
+def test_purchase_places_batch_should_refuse_negative_places(mocker):
+    ''' test batch purchase
+        when an item asks for negative places to cancel another out
+        should refuse the batch without changing points and places '''
+    club = Club("Huge shirts", "huge@shirts.com", 20)
+    competition = Competition("Crazy Tournament", datetime(2099, 10, 22, 13, 30), 10)
+    mocker.patch.object(server, 'STORAGE', JsonStorage(Registry([club], keys=('name', 'email')), Registry([competition])))
+
+    data = {"club": club.name, "competition": [competition.name, competition.name], "places": [-12, 12]}
+    response = app.test_client().post('/purchase-places/batch', data=data)
+    assert b'Crazy Tournament: Sorry, you have to take at least one place.' in response.data
+    assert (club.points, competition.number_of_places) == (20, 10)
+
+
+def test_purchase_places_sold_out_without_waitlist_should_not_promise_places(mocker):
+    ''' test purchase for a sold-out competition when places cannot come back
+        should refuse without offering the waitlist '''
+    club = Club("Huge shirts", "huge@shirts.com", 20)
+    competition = Competition("Crazy Tournament", datetime(2099, 10, 22, 13, 30), 0)
+    mocker.patch.object(server, 'STORAGE', JsonStorage(Registry([club], keys=('name', 'email')), Registry([competition])))
+    mocker.patch.object(server, 'WAITLIST', None)
+
+    response = app.test_client().post('/purchase-places',
+                                      data={"club": club.name, "competition": competition.name, "places": 2})
+    assert b"Sorry, you can&#39;t take more places that are available." in response.data
+    assert b'waitlist' not in response.data
+
+
+def test_summary_should_reuse_cached_clubs_page_and_points_board_refuse_negative_cursor(mocker):
+    ''' test summary pages while nothing is booked
+        should look the first clubs page up once
+        points board should refuse a negative cursor '''
+    mocker.patch.object(server, 'STORAGE', JsonStorage(CLUBS, COMPETITIONS))
+    mocker.patch.object(server, 'FRAGMENTS', FragmentCache())
+    clubs_page = mocker.spy(server.STORAGE, 'clubs_page')
+    client = app.test_client()
+
+    for _ in range(2):
+        assert client.post('/show-summary', data={'email': CLUBS[0]['email']}).status_code == 200
+    assert clubs_page.call_count == 1
+    assert client.get('/points-board?cursor=-1').status_code == 400
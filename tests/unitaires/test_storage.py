@@ -0,0 +1,278 @@
+import multiprocessing
+from datetime import datetime
+
+import booking
+from models import Club, Competition
+from registry import Registry
+from storage import JsonStorage, SharedMemoryStorage, SqliteStorage
+
+BEFORE_COMPETITION = datetime(2022, 1, 1)
+
+CLUBS = [
+    Club("Huge shirts", "huge@shirts.com", 20),
+    Club("Hungry Birds", "admin@hungrybirds.com", 4),
+]
+COMPETITIONS = [
+    Competition("Magic festival", datetime(2020, 3, 27, 10), 25),
+    Competition("Crazy Tournament", datetime(2022, 10, 22, 13, 30), 10),
+]
+
+
+def make_storage(tmp_path):
+    storage = SqliteStorage(str(tmp_path / 'gudlft.sqlite3'))
+    assert storage.is_empty()
+    storage.import_records(CLUBS, COMPETITIONS)
+    return storage
+
+
+def test_sqlite_lookups_should_match_json_records(tmp_path):
+    storage = make_storage(tmp_path)
+    assert not storage.is_empty()
+    assert storage.get_club_by_email('huge@shirts.com') == Club("Huge shirts", "huge@shirts.com", 20)
+    assert storage.get_competition('Magic festival') == COMPETITIONS[0]
+    assert storage.get_club('Invisible Club') is None
+    assert storage.get_competition('Crazy Tournament')['number_of_places'] == 10
+    assert [c['name'] for c in storage.clubs()] == ['Huge shirts', 'Hungry Birds']
+    assert [c['name'] for c in storage.competitions()] == ['Magic festival', 'Crazy Tournament']
+
+
+def test_sqlite_book_should_update_database_and_records(tmp_path):
+    storage = make_storage(tmp_path)
+    club = storage.get_club('Huge shirts')
+    competition = storage.get_competition('Crazy Tournament')
+
+    assert storage.book(club, competition, 3, now=BEFORE_COMPETITION) == booking.BOOKED
+    assert club['points'] == 17
+    assert competition['number_of_places'] == 7
+    assert storage.get_club('Huge shirts')['points'] == 17
+    assert storage.get_competition('Crazy Tournament')['number_of_places'] == 7
+
+
+def test_sqlite_book_should_refuse_with_reason(tmp_path):
+    storage = make_storage(tmp_path)
+    club = storage.get_club('Hungry Birds')
+    assert storage.book(club, storage.get_competition('Magic festival'), 1, now=BEFORE_COMPETITION) == booking.PAST_COMPETITION
+    assert storage.book(club, storage.get_competition('Crazy Tournament'), 5, now=BEFORE_COMPETITION) == booking.NOT_ENOUGH_POINTS
+    assert storage.get_club('Hungry Birds')['points'] == 4
+
+
+def test_workers_sharing_a_database_should_see_same_counts(tmp_path):
+    '''test that a booking made by one worker is checked against by another'''
+    first_worker = make_storage(tmp_path)
+    second_worker = SqliteStorage(str(tmp_path / 'gudlft.sqlite3'))
+
+    competition = first_worker.get_competition('Crazy Tournament')
+    stale_copy = second_worker.get_competition('Crazy Tournament')
+    assert first_worker.book(first_worker.get_club('Huge shirts'), competition, 8, now=BEFORE_COMPETITION) == booking.BOOKED
+
+    outcome = second_worker.book(second_worker.get_club('Huge shirts'), stale_copy, 3, now=BEFORE_COMPETITION)
+    assert outcome == booking.NOT_ENOUGH_PLACES
+    assert second_worker.get_club('Huge shirts')['points'] == 12
+    assert second_worker.get_competition('Crazy Tournament')['number_of_places'] == 2
+
+
+
+
+def test_sqlite_book_should_refuse_places_below_one(tmp_path):
+    storage = make_storage(tmp_path)
+    club = storage.get_club('Huge shirts')
+    competition = storage.get_competition('Crazy Tournament')
+
+    assert storage.book(club, competition, -3, now=BEFORE_COMPETITION) == booking.INVALID_PLACES
+    outcome, refused = storage.book_many(club, [(competition, -3), (competition, 3)], now=BEFORE_COMPETITION)
+    assert (outcome, refused.name) == (booking.INVALID_PLACES, 'Crazy Tournament')
+    assert storage.get_club('Huge shirts').points == 20
+    assert storage.get_competition('Crazy Tournament').number_of_places == 10
+    assert storage.club_totals('Huge shirts')['bookings'] == 0
+
+def test_sqlite_import_should_not_reset_bookings_made_since(tmp_path):
+    '''test that a worker importing the data files late keeps the bookings of the others'''
+    storage = make_storage(tmp_path)
+    storage.book(storage.get_club('Huge shirts'), storage.get_competition('Crazy Tournament'), 3,
+                 now=BEFORE_COMPETITION)
+
+    SqliteStorage(storage.path).import_records(CLUBS, COMPETITIONS)
+    assert storage.get_club('Huge shirts').points == 17
+    assert storage.get_competition('Crazy Tournament').number_of_places == 7
+
+def test_sqlite_clubs_page_should_follow_cursor(tmp_path):
+    storage = make_storage(tmp_path)
+    page, cursor = storage.clubs_page(None, 1)
+    assert [club['name'] for club in page] == ['Huge shirts']
+    page, cursor = storage.clubs_page(cursor, 1)
+    assert [club['name'] for club in page] == ['Hungry Birds']
+    assert cursor is None
+
+
+def test_sqlite_book_many_should_be_all_or_nothing(tmp_path):
+    storage = make_storage(tmp_path)
+    club = storage.get_club('Huge shirts')
+    competition = storage.get_competition('Crazy Tournament')
+
+    outcome = storage.book_many(club, [(competition, 8), (storage.get_competition('Magic festival'), 1)], now=BEFORE_COMPETITION)
+    assert outcome == (booking.PAST_COMPETITION, storage.get_competition('Magic festival'))
+    assert storage.get_club('Huge shirts').points == 20
+
+    assert storage.book_many(club, [(competition, 3), (competition, 4)], now=BEFORE_COMPETITION) == (booking.BOOKED, None)
+    assert club.points == 13
+    assert competition.number_of_places == 3
+    assert storage.get_competition('Crazy Tournament').number_of_places == 3
+
+
+
+def test_sqlite_should_keep_booking_history_and_cap_places_across_bookings(tmp_path):
+    storage = make_storage(tmp_path)
+    club = storage.get_club('Huge shirts')
+    competition = storage.get_competition('Crazy Tournament')
+
+    assert storage.book(club, competition, 8, now=BEFORE_COMPETITION) == booking.BOOKED
+    assert storage.book(club, competition, 5, now=BEFORE_COMPETITION) == booking.TOO_MANY_PLACES
+    assert storage.book_many(club, [(competition, 1)], now=BEFORE_COMPETITION) == (booking.BOOKED, None)
+    assert [(entry.competition, entry.places, entry.booked_at) for entry in storage.history('Huge shirts')] == \
+        [('Crazy Tournament', 8, BEFORE_COMPETITION), ('Crazy Tournament', 1, BEFORE_COMPETITION)]
+    assert storage.club_totals('Huge shirts') == {'bookings': 2, 'places': 9, 'competitions': 1}
+    assert storage.competition_totals('Crazy Tournament') == {'bookings': 2, 'places': 9, 'clubs': 1}
+    assert storage.club_totals('Hungry Birds') == {'bookings': 0, 'places': 0, 'competitions': 0}
+
+def make_json_storage():
+    clubs = Registry([Club("Huge shirts", "huge@shirts.com", 20)], keys=('name', 'email'))
+    competitions = Registry([Competition("Crazy Tournament", datetime(2022, 10, 22, 13, 30), 10)])
+    return JsonStorage(clubs, competitions)
+
+
+def test_json_reload_should_keep_bookings_made_before():
+    storage = make_json_storage()
+    club = storage.get_club('Huge shirts')
+    assert storage.book(club, storage.get_competition('Crazy Tournament'), 3, now=BEFORE_COMPETITION) == booking.BOOKED
+    version = storage.version()
+
+    storage.reload(Registry([Club("Huge shirts", "huge@shirts.com", 20), Club("Iron Temple", "admin@irontemple.com", 4)],
+                            keys=('name', 'email')),
+                   Registry([Competition("Crazy Tournament", datetime(2022, 10, 22, 13, 30), 10),
+                             Competition("Spring Festival", datetime(2022, 3, 27, 10), 25)]))
+
+    assert storage.version() != version
+    assert storage.get_club('Huge shirts')['points'] == 17
+    assert storage.get_club('Iron Temple')['points'] == 4
+    assert storage.get_competition('Crazy Tournament')['number_of_places'] == 7
+    assert storage.get_competition('Spring Festival')['number_of_places'] == 25
+
+
+def test_json_book_with_records_from_before_a_reload_should_update_new_snapshot():
+    storage = make_json_storage()
+    club = storage.get_club('Huge shirts')
+    competition = storage.get_competition('Crazy Tournament')
+    storage.reload(Registry([Club("Huge shirts", "huge@shirts.com", 30)], keys=('name', 'email')),
+                   Registry([Competition("Crazy Tournament", datetime(2022, 10, 22, 13, 30), 10)]))
+
+    assert storage.book(club, competition, 2, now=BEFORE_COMPETITION) == booking.BOOKED
+    assert storage.get_club('Huge shirts')['points'] == 28
+    assert storage.get_competition('Crazy Tournament')['number_of_places'] == 8
+    assert club['points'] == 28
+
+
+def test_json_reload_should_use_replay_when_given():
+    storage = make_json_storage()
+    storage.book(storage.get_club('Huge shirts'), storage.get_competition('Crazy Tournament'), 3, now=BEFORE_COMPETITION)
+    replayed = []
+
+    storage.reload(Registry([Club("Huge shirts", "huge@shirts.com", 17)], keys=('name', 'email')),
+                   Registry([Competition("Crazy Tournament", datetime(2022, 10, 22, 13, 30), 7)]),
+                   replay=lambda clubs, competitions: replayed.append(len(clubs)))
+
+    assert replayed == [1]
+    assert storage.get_club('Huge shirts')['points'] == 17
+
+
+def make_shared_storage():
+    clubs = Registry([Club(f"Club {i}", f"secretary@club{i}.com", 30) for i in range(8)], keys=('name', 'email'))
+    competitions = Registry([Competition("Crazy Tournament", datetime(2022, 10, 22, 13, 30), 50)])
+    return SharedMemoryStorage(clubs, competitions, stripes=4)
+
+
+def test_shared_book_should_refuse_with_reason_and_bump_version():
+    storage = make_shared_storage()
+    try:
+        club = storage.get_club('Club 0')
+        competition = storage.get_competition('Crazy Tournament')
+        assert storage.book(club, competition, 13, now=BEFORE_COMPETITION) == booking.TOO_MANY_PLACES
+        assert storage.version() == 0
+        assert storage.book(club, competition, 3, now=BEFORE_COMPETITION) == booking.BOOKED
+        assert storage.version() == 1
+        assert (club.points, competition.number_of_places) == (27, 47)
+        assert storage.book_many(club, [(competition, 2), (competition, 2)], now=BEFORE_COMPETITION) == \
+            (booking.BOOKED, None)
+        assert storage.get_club_by_email('secretary@club0.com').points == 23
+        assert storage.competitions()[0].number_of_places == 43
+    finally:
+        storage.close()
+
+
+def test_workers_forked_from_shared_storage_should_never_oversell():
+    """test that workers booking the same competition share its places"""
+    storage = make_shared_storage()
+    context = multiprocessing.get_context('fork')
+
+    def worker(i):
+        club = storage.get_club(f"Club {i}")
+        competition = storage.get_competition('Crazy Tournament')
+        for _ in range(10):
+            storage.book(club, competition, 1, now=BEFORE_COMPETITION)
+
+    try:
+        workers = [context.Process(target=worker, args=(i,)) for i in range(8)]
+        for process in workers:
+            process.start()
+        for process in workers:
+            process.join()
+            assert process.exitcode == 0
+        # 80 places asked for 50 available: each sold once, points spent for each
+        assert storage.get_competition('Crazy Tournament').number_of_places == 0
+        assert sum(club.points for club in storage.clubs()) == 8 * 30 - 50
+        assert storage.version() == 50
+    finally:
+        storage.close()
+
+
+def test_shared_places_limit_should_count_bookings_of_every_worker():
+    """test that a club cannot go over 12 places by booking from several workers"""
+    storage = make_shared_storage()
+    context = multiprocessing.get_context('fork')
+
+    def worker():
+        club = storage.get_club('Club 0')
+        competition = storage.get_competition('Crazy Tournament')
+        storage.book(club, competition, 5, now=BEFORE_COMPETITION)
+
+    try:
+        workers = [context.Process(target=worker) for _ in range(2)]
+        for process in workers:
+            process.start()
+        for process in workers:
+            process.join()
+        club, competition = storage.get_club('Club 0'), storage.get_competition('Crazy Tournament')
+        assert storage.book(club, competition, 4, now=BEFORE_COMPETITION) == booking.TOO_MANY_PLACES
+        assert storage.book_many(club, [(competition, 2)], now=BEFORE_COMPETITION) == (booking.BOOKED, None)
+        assert storage.book(club, storage.get_competition('Crazy Tournament'), 1, now=BEFORE_COMPETITION) == \
+            booking.TOO_MANY_PLACES
+        assert storage.book(storage.get_club('Club 1'), competition, 4, now=BEFORE_COMPETITION) == booking.BOOKED
+        assert storage.get_club('Club 0').points == 18
+    finally:
+        storage.close()
+
+
+def test_shared_book_should_refuse_once_booked_places_table_is_full():
+    clubs = Registry([Club(f"Club {i}", f"secretary@club{i}.com", 30) for i in range(2)], keys=('name', 'email'))
+    competitions = Registry([Competition("Crazy Tournament", datetime(2022, 10, 22, 13, 30), 50)])
+    storage = SharedMemoryStorage(clubs, competitions, booked_pairs=1)
+    try:
+        competition = storage.get_competition('Crazy Tournament')
+        assert storage.book(storage.get_club('Club 0'), competition, 1, now=BEFORE_COMPETITION) == booking.BOOKED
+        assert storage.book(storage.get_club('Club 1'), competition, 1, now=BEFORE_COMPETITION) == booking.LEDGER_FULL
+        assert storage.book_many(storage.get_club('Club 1'), [(competition, 1)], now=BEFORE_COMPETITION) == \
+            (booking.LEDGER_FULL, competition)
+        assert storage.book(storage.get_club('Club 0'), competition, 1, now=BEFORE_COMPETITION) == booking.BOOKED
+        assert storage.get_club('Club 1').points == 30
+        assert storage.get_competition('Crazy Tournament').number_of_places == 48
+    finally:
+        storage.close()
@@ -0,0 +1,93 @@
+import random
+from datetime import datetime
+
+from models import Club, Competition
+from registry import Registry
+from storage import JsonStorage
+from waitlist import AdmissionQueue, Waitlist, WaitlistManager
+
+BEFORE_COMPETITION = datetime(2022, 1, 1)
+
+
+def make_storage(places=0):
+    clubs = Registry([Club("Simply Lift", "john@simplylift.co", 13), Club("Iron Temple", "admin@irontemple.com", 4),
+                      Club("She Lifts", "kate@shelifts.co.uk", 12)], keys=('name', 'email'))
+    competitions = Registry([Competition("Fall Classic", datetime(2022, 10, 22, 13, 30), places)])
+    return JsonStorage(clubs, competitions)
+
+
+def test_waitlist_should_keep_the_spot_of_a_club_joining_again():
+    waitlist = Waitlist()
+    assert waitlist.join('Simply Lift', 2) == 1
+    assert waitlist.join('Iron Temple', 1) == 2
+    assert waitlist.join('Simply Lift', 3) == 1
+    assert waitlist.first() == ('Simply Lift', 3)
+    waitlist.leave('Simply Lift')
+    assert waitlist.first() == ('Iron Temple', 1)
+
+
+
+def test_waitlist_positions_should_follow_clubs_leaving_and_joining():
+    rng = random.Random(7)
+    waitlist, expected = Waitlist(), []
+    for _ in range(2000):
+        club_name = f"Club {rng.randrange(50)}"
+        if rng.random() < 0.4:
+            waitlist.leave(club_name)
+            if club_name in expected:
+                expected.remove(club_name)
+        else:
+            if club_name not in expected:
+                expected.append(club_name)
+            assert waitlist.join(club_name, 1) == expected.index(club_name) + 1
+    assert len(waitlist) == len(expected)
+
+
+def test_join_should_refuse_new_clubs_once_waitlist_is_full():
+    manager = WaitlistManager(max_waiting=2)
+    assert manager.join('Simply Lift', 'Fall Classic', 2) == 1
+    assert manager.join('Iron Temple', 'Fall Classic', 1) == 2
+    assert manager.join('She Lifts', 'Fall Classic', 1) is None
+    assert manager.join('Simply Lift', 'Fall Classic', 3) == 1
+    assert manager.join('She Lifts', 'Spring Open', 1) == 1
+
+def test_admit_should_book_in_order_without_skipping_ahead():
+    storage = make_storage()
+    manager = WaitlistManager()
+    manager.join('Simply Lift', 'Fall Classic', 3)
+    manager.join('Iron Temple', 'Fall Classic', 1)
+    storage.get_competition('Fall Classic').number_of_places = 2
+
+    # Simply Lift waits for 3 places: Iron Temple, behind it, is not served first
+    assert manager.admit(storage, 'Fall Classic', now=BEFORE_COMPETITION) == 0
+
+    storage.get_competition('Fall Classic').number_of_places = 4
+    assert manager.admit(storage, 'Fall Classic', now=BEFORE_COMPETITION) == 2
+    assert storage.get_competition('Fall Classic').number_of_places == 0
+    assert storage.get_club('Simply Lift').points == 10
+    assert manager.pop_admitted('Simply Lift') == [('Fall Classic', 3)]
+    assert manager.pop_admitted('Simply Lift') == []
+    assert manager.waiting('Fall Classic') == 0
+
+
+def test_admit_should_drop_clubs_that_can_no_longer_book():
+    storage = make_storage(places=5)
+    manager = WaitlistManager()
+    manager.join('Iron Temple', 'Fall Classic', 5)
+    manager.join('She Lifts', 'Fall Classic', 2)
+
+    assert manager.admit_all(storage, now=BEFORE_COMPETITION) == 1
+    assert manager.pop_admitted('Iron Temple') == []
+    assert manager.pop_admitted('She Lifts') == [('Fall Classic', 2)]
+
+
+def test_admission_queue_should_space_bookings_and_refuse_long_waits():
+    now = [100.0]
+    waits = []
+    queue = AdmissionQueue(rate=10, burst=2, max_wait=0.25, clock=lambda: now[0], sleep=waits.append)
+
+    assert [queue.admit() for _ in range(5)] == [True, True, True, True, False]
+    assert [round(wait, 3) for wait in waits] == [0.1, 0.2]
+
+    now[0] += 10
+    assert queue.admit()
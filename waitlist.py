@@ -0,0 +1,161 @@
+import threading
+import time
+from collections import OrderedDict
+
+import booking
+
+
+class Waitlist:
+    """Clubs waiting for places in one competition, first come first served.
+
+    Entries are kept in an ordered dict of club name to places, so taking
+    the head and leaving are O(1). Each club also holds the ticket it drew
+    when joining, and a Fenwick tree over the tickets counts the clubs still
+    waiting ahead of it, so a position is found in O(log n) when a club
+    joins again.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._tickets = {}
+        # Fenwick tree over tickets 1, 2, ...: 1 while the ticket's club waits
+        self._tree = [0]
+
+    def join(self, club_name, places):
+        """Add the club, or update the places it waits for, and return its position."""
+        if club_name in self._entries:
+            self._entries[club_name] = places
+            return self._waiting_up_to(self._tickets[club_name])
+        self._entries[club_name] = places
+        self._tickets[club_name] = self._draw_ticket()
+        return len(self._entries)
+
+    def leave(self, club_name):
+        if self._entries.pop(club_name, None) is not None:
+            self._mark(self._tickets.pop(club_name), -1)
+
+    def first(self):
+        return next(iter(self._entries.items()))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, club_name):
+        return club_name in self._entries
+
+    def _draw_ticket(self):
+        ticket = len(self._tree)
+        # the node covers tickets (ticket - lowbit, ticket], all waiting up to the new one
+        self._tree.append(1 + self._waiting_up_to(ticket - 1) - self._waiting_up_to(ticket - (ticket & -ticket)))
+        return ticket
+
+    def _mark(self, ticket, delta):
+        while ticket < len(self._tree):
+            self._tree[ticket] += delta
+            ticket += ticket & -ticket
+
+    def _waiting_up_to(self, ticket):
+        waiting = 0
+        while ticket > 0:
+            waiting += self._tree[ticket]
+            ticket -= ticket & -ticket
+        return waiting
+
+
+class WaitlistManager:
+    """Waitlists of every competition, admitting clubs as places free up.
+
+    ``admit`` books the places of the clubs at the head of a waitlist, in
+    order, while they fit in the places left; it never lets a later club
+    skip ahead of one asking for more. Clubs that can no longer book (the
+    competition took place, points spent) leave the waitlist. Bookings made
+    that way are kept until ``pop_admitted`` hands them to the club.
+
+    A waitlist holds at most ``max_waiting`` clubs; ``join`` returns None
+    for a new club once it is full.
+    """
+
+    def __init__(self, max_waiting=None):
+        self.max_waiting = max_waiting
+        self._waitlists = {}
+        self._admitted = {}
+        self._lock = threading.Lock()
+
+    def join(self, club_name, competition_name, places):
+        """Position of the club on the competition's waitlist, None if it is full."""
+        with self._lock:
+            waitlist = self._waitlists.setdefault(competition_name, Waitlist())
+            if self.max_waiting is not None and len(waitlist) >= self.max_waiting and club_name not in waitlist:
+                return None
+            return waitlist.join(club_name, places)
+
+    def leave(self, club_name, competition_name):
+        with self._lock:
+            waitlist = self._waitlists.get(competition_name)
+            if waitlist is not None:
+                waitlist.leave(club_name)
+
+    def waiting(self, competition_name):
+        return len(self._waitlists.get(competition_name, ()))
+
+    def admit(self, storage, competition_name, now=None):
+        """Book for the clubs waiting on the competition while places allow."""
+        admitted = 0
+        with self._lock:
+            waitlist = self._waitlists.get(competition_name)
+            competition = storage.get_competition(competition_name)
+            while waitlist and competition is not None:
+                club_name, places = waitlist.first()
+                if places > competition.number_of_places:
+                    break
+                club = storage.get_club(club_name)
+                outcome = storage.book(club, competition, places, now=now) if club else None
+                if outcome == booking.NOT_ENOUGH_PLACES:
+                    # a direct booking took the places first, the club keeps its turn
+                    break
+                waitlist.leave(club_name)
+                if outcome == booking.BOOKED:
+                    self._admitted.setdefault(club_name, []).append((competition_name, places))
+                    admitted += 1
+            if waitlist is not None and not waitlist:
+                del self._waitlists[competition_name]
+        return admitted
+
+    def admit_all(self, storage, now=None):
+        return sum(self.admit(storage, name, now=now) for name in list(self._waitlists))
+
+    def pop_admitted(self, club_name):
+        """``(competition name, places)`` booked for the club since it last asked."""
+        with self._lock:
+            return self._admitted.pop(club_name, [])
+
+
+class AdmissionQueue:
+    """Lets bookings through at a steady ``rate`` per second, in arrival order.
+
+    Each booking is given the next free slot, ``1 / rate`` seconds after the
+    previous one, and waits for it; up to ``burst`` bookings go through at
+    once after a quiet period. A booking whose slot is more than
+    ``max_wait`` seconds away is refused instead of queued.
+    """
+
+    def __init__(self, rate, burst=1, max_wait=5, clock=time.monotonic, sleep=time.sleep):
+        self.interval = 1 / rate
+        self.burst = burst
+        self.max_wait = max_wait
+        self.clock = clock
+        self.sleep = sleep
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def admit(self):
+        """Wait for the booking's slot and return True, or False if it is too far."""
+        with self._lock:
+            now = self.clock()
+            slot = max(self._next_slot, now - (self.burst - 1) * self.interval)
+            if slot - now > self.max_wait:
+                return False
+            self._next_slot = slot + self.interval
+        if slot > now:
+            self.sleep(slot - now)
+        return True